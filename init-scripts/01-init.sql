@@ -1,3 +1,5 @@
+-- ========== TABLES ==========
+
 -- Main anime table
 CREATE TABLE IF NOT EXISTS anime (
     mal_id INTEGER PRIMARY KEY,
@@ -118,6 +120,17 @@ CREATE TABLE IF NOT EXISTS anime_character_voice_actors (
     PRIMARY KEY (anime_id, character_id, voice_actor_id)
 );
 
+-- ========== LOAD MANIFEST ==========
+
+-- Content hash of each loaded anime (metadata + characters), lets reloads skip unchanged anime
+CREATE TABLE IF NOT EXISTS anime_manifest (
+    mal_id INTEGER PRIMARY KEY REFERENCES anime(mal_id) ON DELETE CASCADE,
+    content_hash CHAR(64) NOT NULL,
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ========== INDEXES ==========
+
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_anime_studios_anime_id ON anime_studios(anime_id);
 CREATE INDEX IF NOT EXISTS idx_anime_studios_studio_id ON anime_studios(studio_id);
@@ -139,10 +152,12 @@ CREATE INDEX IF NOT EXISTS idx_acva_anime_id ON anime_character_voice_actors (an
 CREATE INDEX IF NOT EXISTS idx_acva_character_id ON anime_character_voice_actors (character_id);
 CREATE INDEX IF NOT EXISTS idx_acva_voice_actor_id ON anime_character_voice_actors (voice_actor_id);
 
--- CREATE INDEX IF NOT EXISTS idx_anime_score ON anime(score DESC);
--- CREATE INDEX IF NOT EXISTS idx_anime_popularity ON anime(popularity);
--- CREATE INDEX IF NOT EXISTS idx_anime_type ON anime(type);
--- CREATE INDEX IF NOT EXISTS idx_anime_season_year ON anime(year, season);
+CREATE INDEX IF NOT EXISTS idx_anime_score ON anime(score DESC);
+CREATE INDEX IF NOT EXISTS idx_anime_popularity ON anime(popularity);
+CREATE INDEX IF NOT EXISTS idx_anime_type ON anime(type);
+CREATE INDEX IF NOT EXISTS idx_anime_season_year ON anime(year, season);
+
+-- ========== TRIGGERS ==========
 
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -155,4 +170,178 @@ $$ language 'plpgsql';
 
 -- Trigger for anime table
 CREATE TRIGGER update_anime_updated_at BEFORE UPDATE ON anime
-    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
\ No newline at end of file
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- ========== CHANGE TRACKING ==========
+
+-- Change tracking for the incremental indexer (ElasticsearchService.index_changes)
+-- anime rows carry updated_at; changes to their characters, voice actors and junction
+-- links are logged per anime by statement-level triggers, so no anime row is rewritten
+CREATE TABLE IF NOT EXISTS anime_changes (
+    anime_id INTEGER NOT NULL,
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- High-water mark of each index generation: every change before it is indexed
+CREATE TABLE IF NOT EXISTS index_watermarks (
+    name VARCHAR(200) PRIMARY KEY,
+    high_water_mark TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_anime_updated_at ON anime(updated_at);
+CREATE INDEX IF NOT EXISTS idx_anime_changes_changed_at ON anime_changes(changed_at);
+
+-- Junction rows inserted, updated or deleted: log their anime
+CREATE OR REPLACE FUNCTION log_anime_changes() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO anime_changes (anime_id)
+    SELECT DISTINCT anime_id FROM changed_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Characters / voice actors updated: log every anime they appear in
+CREATE OR REPLACE FUNCTION log_entity_changes() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'characters' THEN
+        INSERT INTO anime_changes (anime_id)
+        SELECT DISTINCT ac.anime_id
+        FROM changed_rows c
+        JOIN anime_characters ac ON ac.character_id = c.mal_id;
+    ELSE
+        INSERT INTO anime_changes (anime_id)
+        SELECT DISTINCT acva.anime_id
+        FROM changed_rows va
+        JOIN anime_character_voice_actors acva ON acva.voice_actor_id = va.mal_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One trigger per table and event (a trigger with a transition table has a single event)
+DO $$
+DECLARE
+    tbl TEXT;
+    event TEXT;
+    trigger_name TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['anime_studios', 'anime_genres', 'anime_themes', 'anime_demographics',
+                               'anime_characters', 'anime_character_voice_actors'] LOOP
+        FOREACH event IN ARRAY ARRAY['INSERT', 'UPDATE', 'DELETE'] LOOP
+            trigger_name := 'log_' || tbl || '_' || lower(event);
+            IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = trigger_name) THEN
+                EXECUTE 'CREATE TRIGGER ' || quote_ident(trigger_name)
+                    || ' AFTER ' || event || ' ON ' || quote_ident(tbl)
+                    || ' REFERENCING ' || CASE WHEN event = 'DELETE' THEN 'OLD' ELSE 'NEW' END
+                    || ' TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION log_anime_changes()';
+            END IF;
+        END LOOP;
+    END LOOP;
+
+    FOREACH tbl IN ARRAY ARRAY['characters', 'voice_actors'] LOOP
+        trigger_name := 'log_' || tbl || '_update';
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = trigger_name) THEN
+            EXECUTE 'CREATE TRIGGER ' || quote_ident(trigger_name)
+                || ' AFTER UPDATE ON ' || quote_ident(tbl)
+                || ' REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION log_entity_changes()';
+        END IF;
+    END LOOP;
+END;
+$$;
+
+-- ========== DOCUMENT FUNCTIONS ==========
+
+-- Derived search fields of anime documents, built by Postgres (see ElasticsearchService sql_documents)
+-- Each mirrors its Python counterpart in services/elasticsearch_service.py / utils/helpers.py
+
+-- extract_minutes_from_duration: '24 min per ep' -> 24, '1 hr 30 min' -> 30 (first pattern wins), '2 cours' -> 576
+CREATE OR REPLACE FUNCTION duration_minutes(duration TEXT) RETURNS INTEGER AS $$
+DECLARE
+    d TEXT := lower(duration);
+    m TEXT[];
+BEGIN
+    IF duration IS NULL OR duration = '' THEN
+        RETURN NULL;
+    END IF;
+    m := regexp_match(d, '(\d+)\s*min(?!\s*hr)');
+    IF m IS NOT NULL THEN RETURN m[1]::INTEGER; END IF;
+    m := regexp_match(d, '(\d+)\s*hr(?:\s*(\d+)\s*min)?');
+    IF m IS NOT NULL THEN RETURN m[1]::INTEGER * 60 + COALESCE(m[2]::INTEGER, 0); END IF;
+    m := regexp_match(d, '(\d+\.?\d*)\s*hr');
+    IF m IS NOT NULL THEN RETURN floor(m[1]::NUMERIC * 60)::INTEGER; END IF;
+    m := regexp_match(d, '(\d+)\s*sec');
+    IF m IS NOT NULL THEN RETURN CASE WHEN m[1]::INTEGER >= 30 THEN 1 ELSE 0 END; END IF;
+    m := regexp_match(d, '(\d+)\s*cour');
+    IF m IS NOT NULL THEN RETURN m[1]::INTEGER * 288; END IF;
+    m := regexp_match(d, '(\d+)');
+    IF m IS NOT NULL THEN RETURN m[1]::INTEGER; END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- extract_year_month_season: year and season of the first 'Mon DD, YYYY' date of an aired string
+CREATE OR REPLACE FUNCTION aired_start(aired TEXT, OUT year INTEGER, OUT season TEXT) AS $$
+DECLARE
+    m TEXT[] := regexp_match(aired, '([A-Za-z]{3})\s+\d{1,2},\s*(\d{4})');
+    pos INTEGER;
+    month INTEGER;
+BEGIN
+    IF m IS NULL THEN
+        RETURN;
+    END IF;
+    pos := strpos('janfebmaraprmayjunjulaugsepoctnovdec', lower(m[1]));
+    IF pos = 0 OR mod(pos, 3) <> 1 THEN
+        RETURN;
+    END IF;
+    month := (pos + 2) / 3;
+    year := m[2]::INTEGER;
+    season := CASE
+        WHEN month IN (12, 1, 2) THEN 'winter'
+        WHEN month IN (3, 4, 5) THEN 'spring'
+        WHEN month IN (6, 7, 8) THEN 'summer'
+        ELSE 'autumn'
+    END;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Words of a title, split on spaces and slashes
+CREATE OR REPLACE FUNCTION title_tokens(title TEXT) RETURNS TEXT[] AS $$
+    SELECT COALESCE(array_remove(regexp_split_to_array(btrim(title), '[ /]+'), ''), '{}')
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Titles an anime is found by: title, English title, synonyms
+CREATE OR REPLACE FUNCTION search_full_names(title TEXT, title_english TEXT, synonyms TEXT[]) RETURNS TEXT[] AS $$
+    SELECT ARRAY[title]
+        || CASE WHEN COALESCE(title_english, '') <> '' THEN ARRAY[title_english] ELSE '{}' END
+        || COALESCE(synonyms, '{}')
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Full names plus their words, plus character names with "Last, First" also as "First Last", First and Last
+CREATE OR REPLACE FUNCTION search_key_names(title TEXT, title_english TEXT, synonyms TEXT[], character_names TEXT[])
+RETURNS TEXT[] AS $$
+    SELECT ARRAY[title] || title_tokens(title)
+        || CASE WHEN COALESCE(title_english, '') <> '' THEN ARRAY[title_english] || title_tokens(title_english) ELSE '{}' END
+        || COALESCE(synonyms, '{}')
+        || COALESCE((
+            SELECT array_agg(token ORDER BY n, t)
+            FROM unnest(synonyms) WITH ORDINALITY AS s(synonym, n),
+                 unnest(title_tokens(s.synonym)) WITH ORDINALITY AS tokens(token, t)
+            WHERE s.synonym <> ''
+        ), '{}')
+        || COALESCE((
+            SELECT array_agg(DISTINCT variant)
+            FROM unnest(character_names) AS c(name)
+            CROSS JOIN LATERAL (
+                SELECT btrim(c.name) AS full_name,
+                       btrim(split_part(btrim(c.name), ', ', 1)) AS last_name,
+                       btrim(substr(btrim(c.name), strpos(btrim(c.name), ', ') + 2)) AS first_name
+            ) p
+            CROSS JOIN LATERAL unnest(CASE
+                WHEN strpos(p.full_name, ', ') > 0
+                    THEN ARRAY[p.full_name, p.first_name || ' ' || p.last_name, p.first_name, p.last_name]
+                ELSE ARRAY[p.full_name]
+            END) AS variant
+            WHERE c.name <> ''
+        ), '{}')
+$$ LANGUAGE sql IMMUTABLE;
@@ -0,0 +1,85 @@
+# Benchmark: loose data/characters/*.json files vs the packed character store
+# Packs the loose files into a temporary store, then compares disk footprint and
+# cold-load time (page cache dropped for the files before each run) for a full
+# scan and for random lookups by anime mal_id.
+#
+# Usage:
+#   python -m scripts.bench_character_store --characters-dir data/characters
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from services.character_store import CharacterStore, pack_character_files
+
+
+def drop_page_cache(paths):
+    """Evict the files from the OS page cache so the next read is cold"""
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def load_loose(paths):
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare loose character files with the packed store")
+    parser.add_argument('--characters-dir', default="data/characters", help='Directory of loose character files')
+    parser.add_argument('--lookups', type=int, default=500, help='Number of random lookups to time')
+    args = parser.parse_args()
+
+    loose_paths = sorted(Path(args.characters_dir).glob("*_characters.json"))
+    loose_ids = [int(p.stem.replace("_characters", "")) for p in loose_paths]
+    sample = random.Random(42).sample(loose_ids, min(args.lookups, len(loose_ids)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CharacterStore(Path(tmp) / "characters_packed")
+        pack_seconds = timed(lambda: pack_character_files(args.characters_dir, store))
+        packed_paths = [p for p in store.root.iterdir() if p.is_file()]
+
+        drop_page_cache(loose_paths)
+        loose_scan = timed(lambda: load_loose(loose_paths))
+
+        drop_page_cache(packed_paths)
+        packed_scan = timed(lambda: sum(1 for _ in CharacterStore(store.root)))
+
+        drop_page_cache(loose_paths)
+        loose_random = timed(lambda: load_loose(Path(args.characters_dir) / f"{i}_characters.json" for i in sample))
+
+        drop_page_cache(packed_paths)
+        reopened = CharacterStore(store.root)
+        packed_random = timed(lambda: [reopened.get(i) for i in sample])
+
+        loose_bytes = sum(p.stat().st_size for p in loose_paths)
+        packed_bytes = store.disk_usage()
+
+    print("=" * 60)
+    print("CHARACTER STORE BENCHMARK")
+    print("=" * 60)
+    print(f"{'anime':28} {len(loose_paths):,}")
+    print(f"{'pack time':28} {pack_seconds:.2f} s")
+    print(f"{'disk: loose files':28} {loose_bytes / 1024 / 1024:.1f} MB")
+    print(f"{'disk: packed store':28} {packed_bytes / 1024 / 1024:.1f} MB "
+          f"({loose_bytes / max(packed_bytes, 1):.1f}x smaller)")
+    print(f"{'cold full scan: loose':28} {loose_scan:.2f} s")
+    print(f"{'cold full scan: packed':28} {packed_scan:.2f} s ({loose_scan / packed_scan:.1f}x)")
+    print(f"{f'cold {len(sample)} lookups: loose':28} {loose_random:.3f} s")
+    print(f"{f'cold {len(sample)} lookups: packed':28} {packed_random:.3f} s")
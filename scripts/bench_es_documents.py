@@ -0,0 +1,91 @@
+# Benchmark: indexer CPU per 10k anime documents, built in Python vs built by Postgres
+# The Python path fetches dict rows, builds each document (anime_action) and serializes
+# the bulk body; the SQL path fetches `_source` JSON text (ANIME_SOURCE_SELECT) and joins
+# it into the NDJSON body as is. Reports client CPU (process time) and wall time per path;
+# with --send the bodies are also bulk indexed, into the configured anime index.
+#
+# Runs against the configured PostgreSQL (and Elasticsearch with --send).
+#
+# Usage:
+#   python -m scripts.bench_es_documents --limit 10000
+#   python -m scripts.bench_es_documents --limit 10000 --send
+
+import argparse
+import time
+
+from elastic_transport import JsonSerializer
+
+from services.database import Database
+from services.elasticsearch_service import (
+    ANIME_DOCUMENT_SELECT, ANIME_RELATIONS_CTE, ANIME_SOURCE_SELECT, ElasticsearchService
+)
+
+
+def python_documents(es, db, limit, batch_size, send):
+    """(documents, body bytes) of the dict rows -> anime_action -> JSON path"""
+    serializer = JsonSerializer()
+    query = ANIME_RELATIONS_CTE.format(anime_filter="") + ANIME_DOCUMENT_SELECT
+    documents = size = 0
+    last_mal_id = -1
+    while documents < limit:
+        rows = db.execute_query(query, (last_mal_id, min(batch_size, limit - documents)))
+        if not rows:
+            break
+        last_mal_id = rows[-1]['mal_id']
+        lines = []
+        for action in map(es.anime_action, rows):
+            lines.append(serializer.dumps({"index": {"_index": action["_index"], "_id": action["_id"]}}))
+            lines.append(serializer.dumps(action["_source"]))
+        body = b"\n".join(lines) + b"\n"
+        if send:
+            es.es.bulk(operations=body, filter_path="errors")
+        documents += len(rows)
+        size += len(body)
+    return documents, size
+
+
+def sql_documents(es, db, limit, batch_size, send):
+    """(documents, body bytes) of the Postgres JSON text -> NDJSON path"""
+    db.ensure_document_functions()
+    query = ANIME_RELATIONS_CTE.format(anime_filter="") + ANIME_SOURCE_SELECT
+    documents = size = 0
+    last_mal_id = -1
+    while documents < limit:
+        rows = list(db.stream_query(query, (last_mal_id, min(batch_size, limit - documents)),
+                                    row_factory="tuple"))
+        if not rows:
+            break
+        last_mal_id = rows[-1][0]
+        lines = []
+        for doc_id, source in rows:
+            lines.append(f'{{"index":{{"_index":"{es.indices["anime"]}","_id":"{doc_id}"}}}}')
+            lines.append(source)
+        body = ("\n".join(lines) + "\n").encode("utf-8")
+        if send:
+            es.es.bulk(operations=body, filter_path="errors")
+        documents += len(rows)
+        size += len(body)
+    return documents, size
+
+
+def measure(build, *args):
+    cpu, wall = time.process_time(), time.perf_counter()
+    documents, size = build(*args)
+    return documents, size, time.process_time() - cpu, time.perf_counter() - wall
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare indexer CPU of Python-built and Postgres-built documents")
+    parser.add_argument('--limit', type=int, default=10000, help='Anime documents per path (default: 10000)')
+    parser.add_argument('--batch-size', dest='batch_size', type=int, default=500, help='Anime per query')
+    parser.add_argument('--send', action='store_true', help='Also bulk index the bodies (writes to anime_index)')
+    options = parser.parse_args()
+
+    es = ElasticsearchService()
+    db = Database()
+
+    print(f"\n{'path':8} {'docs':>8} {'body':>10} {'CPU':>9} {'CPU/10k':>9} {'wall':>9}")
+    for name, build in (("python", python_documents), ("sql", sql_documents)):
+        documents, size, cpu, wall = measure(build, es, db, options.limit, options.batch_size, options.send)
+        per_10k = cpu / documents * 10000 if documents else 0
+        print(f"{name:8} {documents:>8} {size / 1e6:>8.1f}MB {cpu:>8.2f}s {per_10k:>8.2f}s {wall:>8.2f}s")
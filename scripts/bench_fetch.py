@@ -0,0 +1,129 @@
+# Throughput benchmark for the Jikan fetch engine
+# Starts a local stand-in for the Jikan API that enforces the same kind of
+# per-second / per-minute limits (answering 429 + Retry-After when exceeded),
+# then fetches /anime/{id}/characters for N ids and reports requests per second.
+#
+# Usage:
+#   python -m scripts.bench_fetch --requests 200 --per-second 30 --per-minute 600
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services.jikan_client import JikanClient, TokenBucket
+
+
+class JikanStandIn(ThreadingHTTPServer):
+    """Local HTTP server that simulates Jikan's rate limits and latency"""
+
+    daemon_threads = True
+
+    def __init__(self, limits, latency=(0.05, 0.25)):
+        super().__init__(("127.0.0.1", 0), JikanStandInHandler)
+        self.limits = limits
+        self.latency = latency
+        self.windows = [deque() for _ in limits]
+        self.lock = threading.Lock()
+        self.served = 0
+        self.rejected = 0
+
+    def admit(self):
+        """Return 0 if the request is within budget, else the seconds to wait"""
+        with self.lock:
+            now = time.monotonic()
+            wait = 0.0
+            for (capacity, period), window in zip(self.limits, self.windows):
+                while window and window[0] + period <= now:
+                    window.popleft()
+                if len(window) >= capacity:
+                    wait = max(wait, window[0] + period - now)
+            if wait > 0:
+                self.rejected += 1
+                return wait
+            for window in self.windows:
+                window.append(now)
+            self.served += 1
+            return 0
+
+
+class JikanStandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        wait = self.server.admit()
+        if wait:
+            self.send_response(429)
+            self.send_header("Retry-After", f"{wait:.3f}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        time.sleep(random.uniform(*self.server.latency))
+        body = json.dumps({"data": [{
+            "character": {"mal_id": 1, "name": "Spiegel, Spike", "images": {"jpg": {"image_url": ""}}},
+            "role": "Main",
+            "favorites": 1,
+            "voice_actors": []
+        }]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def run_benchmark(total_requests, limits, concurrency):
+    server = JikanStandIn(limits)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    client = JikanClient(
+        base_url=f"http://127.0.0.1:{server.server_address[1]}",
+        limiter=TokenBucket(limits),
+        concurrency=concurrency
+    )
+
+    def fetch(mal_id):
+        response = client.get(f"/anime/{mal_id}/characters")
+        return response is not None and response.status_code == 200
+
+    start = time.perf_counter()
+    ok = sum(1 for _, success in client.map(fetch, range(total_requests)) if success is True)
+    elapsed = time.perf_counter() - start
+
+    server.shutdown()
+    server.server_close()
+
+    # Shortest possible run: every window admits `capacity` requests per `period`
+    ideal_elapsed = max((total_requests - 1) // capacity * period for capacity, period in limits)
+    return {
+        "requests": total_requests,
+        "successful": ok,
+        "rejected_429": server.rejected,
+        "elapsed_s": round(elapsed, 2),
+        "requests_per_s": round(ok / elapsed, 2),
+        "ideal_elapsed_s": round(ideal_elapsed, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the concurrent Jikan fetcher")
+    parser.add_argument('--requests', type=int, default=200, help='Number of requests to send')
+    parser.add_argument('--per-second', type=int, default=30, help='Simulated per-second budget')
+    parser.add_argument('--per-minute', type=int, default=600, help='Simulated per-minute budget')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent fetch workers')
+    args = parser.parse_args()
+
+    limits = ((args.per_second, 1.0), (args.per_minute, 60.0))
+    result = run_benchmark(args.requests, limits, args.concurrency)
+
+    print("=" * 50)
+    print("JIKAN FETCH BENCHMARK")
+    print("=" * 50)
+    for key, value in result.items():
+        print(f"{key:22} {value}")
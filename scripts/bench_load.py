@@ -0,0 +1,82 @@
+# Benchmark: execute_values (Database.bulk_*) vs COPY through temporary staging tables
+# Builds the loader's staging lists from the local catalog and character store, then
+# loads them with both paths into a scratch schema (a copy of the public tables,
+# without foreign keys) and reports rows per second per table. Each path is timed on
+# an empty schema (insert) and again on the loaded one (every row conflicts).
+#
+# Usage:
+#   python -m scripts.bench_load --schema bench_load
+
+import argparse
+import time
+
+from scripts.load_anime import AnimeLoader
+
+TABLES = (
+    "anime", "studios", "anime_studios", "genres", "anime_genres", "themes", "anime_themes",
+    "demographics", "anime_demographics", "characters", "anime_characters",
+    "voice_actors", "anime_character_voice_actors", "anime_manifest",
+)
+
+
+def create_scratch_schema(db, schema):
+    """Empty copies of the public tables (with the anime updated_at trigger) in `schema`"""
+    statements = [f"DROP SCHEMA IF EXISTS {schema} CASCADE", f"CREATE SCHEMA {schema}"]
+    statements += [f"CREATE TABLE {schema}.{table} (LIKE public.{table} INCLUDING ALL)" for table in TABLES]
+    statements.append(f"""
+    CREATE TRIGGER update_anime_updated_at BEFORE UPDATE ON {schema}.anime
+        FOR EACH ROW EXECUTE FUNCTION public.update_updated_at_column()
+    """)
+    for statement in statements:
+        db.execute_query(statement)
+
+
+def load(loader, staging, use_copy):
+    """Load every staging list; returns {list name: seconds}"""
+    loader.use_copy = use_copy
+    timings = {}
+    for name in loader.STAGING_LISTS:
+        start = time.perf_counter()
+        loader.insert_staging({n: staging[n] if n == name else [] for n in loader.STAGING_LISTS})
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def report(label, staging, timings):
+    total_rows = sum(len(rows) for rows in staging.values())
+    total_seconds = sum(timings.values())
+    print(f"\n{label}: {total_rows} rows in {total_seconds:.2f}s ({total_rows / total_seconds:,.0f} rows/s)")
+    for name, seconds in timings.items():
+        rows = len(staging[name])
+        print(f"  {name:32} {rows:>8} rows {seconds:8.3f}s {rows / seconds if seconds else 0:>12,.0f} rows/s")
+    return total_seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare execute_values with COPY + staging tables")
+    parser.add_argument('--schema', default="bench_load", help='Scratch schema (dropped and recreated)')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch schema afterwards')
+    args = parser.parse_args()
+
+    loader = AnimeLoader()
+    loader.db.ensure_manifest()
+    loader.build_staging_lists()
+    staging = loader.take_staging_lists()
+
+    # Every connection of this benchmark resolves table names to the scratch schema first
+    loader.db.conn_params["options"] = f"-c search_path={args.schema},public"
+    loader.db.pool.clear()
+
+    results = {}
+    for label, use_copy in (("execute_values", False), ("COPY + staging", True)):
+        create_scratch_schema(loader.db, args.schema)
+        results[label] = (
+            report(f"{label} (empty tables)", staging, load(loader, staging, use_copy)),
+            report(f"{label} (all conflicts)", staging, load(loader, staging, use_copy)),
+        )
+
+    (ev_insert, ev_upsert), (copy_insert, copy_upsert) = results.values()
+    print(f"\nCOPY speedup: {ev_insert / copy_insert:.1f}x on empty tables, {ev_upsert / copy_upsert:.1f}x on conflicts")
+
+    if not args.keep:
+        loader.db.execute_query(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
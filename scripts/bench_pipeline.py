@@ -0,0 +1,101 @@
+# Benchmark: the ingest pipeline (generate → load into PostgreSQL → index into Elasticsearch)
+# at a given scale. Generates a synthetic catalog (scripts/generate_synthetic.py) unless
+# one of the right size already exists in --data-dir, then runs each stage in its own
+# process and reports wall time, throughput and peak RSS per stage.
+#
+# Runs against the configured PostgreSQL / Elasticsearch (the local containers) and
+# writes into them: use a throwaway database, e.g. after `docker compose down -v`.
+#
+# Usage:
+#   python -m scripts.bench_pipeline --count 30000
+#   python -m scripts.bench_pipeline --count 300000 --stages load --copy --stream
+
+import argparse
+import multiprocessing
+import resource
+import time
+from pathlib import Path
+
+STAGES = ("generate", "load", "index")
+
+
+def run_generate(options):
+    from scripts.generate_synthetic import generate
+    generate(options.data_dir, options.count, options.seed)
+    return options.count, "anime"
+
+
+def run_load(options):
+    from scripts.load_anime import AnimeLoader
+    loader = AnimeLoader(use_copy=options.use_copy, parallel=options.parallel, data_dir=options.data_dir,
+                         defer_indexes=options.defer_indexes)
+    loader.run(stream=options.stream, chunk_size=options.chunk_size)
+    return len(loader.fetcher.catalog), "anime"
+
+
+def run_index(options):
+    from services.database import Database
+    from services.elasticsearch_service import ElasticsearchService
+    es = ElasticsearchService()
+    results = es.reindex(Database())
+    return sum(results.values()), "docs"
+
+
+def _stage_process(stage, options, results):
+    """Child process body: run one stage, report (items, unit, seconds, peak RSS bytes)"""
+    start = time.perf_counter()
+    items, unit = globals()[f"run_{stage}"](options)
+    seconds = time.perf_counter() - start
+    results.put((items, unit, seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024))
+
+
+def run_stage(stage, options):
+    """Run a stage in a fresh process, so its peak RSS is its own"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_stage_process, args=(stage, options, results))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"Stage {stage} failed (exit code {process.exitcode})")
+    return results.get()
+
+
+def catalog_size(data_dir):
+    from services.catalog_store import CatalogStore
+    path = Path(data_dir) / "anime_data.jsonl"
+    return len(CatalogStore(path)) if path.exists() else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the load and index pipeline on a synthetic catalog")
+    parser.add_argument('--count', type=int, default=30000, help='Synthetic anime (default: 30000)')
+    parser.add_argument('--seed', type=int, default=42, help='Generator seed')
+    parser.add_argument('--data-dir', dest='data_dir', default=None,
+                        help='Synthetic dataset directory (default: data/synthetic_<count>)')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES),
+                        help='Stages to run (generate is skipped when the catalog already has --count anime)')
+    parser.add_argument('--copy', dest='use_copy', action='store_true', help='Load with COPY (see load_anime --copy)')
+    parser.add_argument('--stream', action='store_true', help='Load in chunks (see load_anime --stream)')
+    parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=500, help='Anime per chunk with --stream')
+    parser.add_argument('--parallel', type=int, default=1, help='Tables loaded concurrently (see load_anime --parallel)')
+    parser.add_argument('--defer-indexes', dest='defer_indexes', action='store_true',
+                        help='Rebuild secondary indexes after the load (see load_anime --defer-indexes)')
+    options = parser.parse_args()
+    options.data_dir = options.data_dir or f"data/synthetic_{options.count}"
+
+    stages = list(options.stages)
+    if "generate" in stages and catalog_size(options.data_dir) == options.count:
+        print(f"✅ Reusing the {options.count} anime catalog in {options.data_dir}")
+        stages.remove("generate")
+
+    report = []
+    for stage in stages:
+        print(f"\n========== {stage.upper()} ==========")
+        report.append((stage, *run_stage(stage, options)))
+
+    print(f"\nPipeline benchmark: {options.count} anime in {options.data_dir}")
+    print(f"{'stage':10} {'items':>10} {'wall':>10} {'throughput':>16} {'peak RSS':>10}")
+    for stage, items, unit, seconds, peak_rss in report:
+        rate = f"{items / seconds:,.0f} {unit}/s" if seconds else "-"
+        print(f"{stage:10} {items:>10,} {seconds:>9.1f}s {rate:>16} {peak_rss / 1e6:>8.0f}MB")
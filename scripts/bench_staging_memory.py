@@ -0,0 +1,58 @@
+# Benchmark: memory of the loader's int-only junction lists as Python tuples vs int32 columns
+# Stages the local catalog and character store once, then rebuilds every int junction
+# list both ways and reports traced allocation size and bytes per row, plus the time to
+# dedupe each list with a dict (tuples) and with np.unique on packed keys (columns).
+#
+# Usage:
+#   python -m scripts.bench_staging_memory
+
+import time
+import tracemalloc
+
+from scripts.load_anime import AnimeLoader
+from services.staging_buffers import IntColumns
+
+
+def traced(build):
+    """(result, bytes allocated by build() that are still alive)"""
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    loader = AnimeLoader()
+    loader.build_staging_lists()
+    staging = loader.take_staging_lists()
+    loader.close()
+
+    totals = [0, 0, 0]
+    print(f"\n{'list':32} {'rows':>8} {'tuples':>10} {'columns':>10} {'B/row':>11} {'dict dedupe':>12} {'np.unique':>10}")
+    for name, width in AnimeLoader.INT_COLUMN_LISTS.items():
+        # Fresh int objects per row, as json parsing produces them
+        source = [tuple(int(str(value)) for value in row) for row in staging[name]]
+        tuples, tuple_bytes = traced(lambda: [tuple(int(str(v)) for v in row) for row in source])
+        columns, column_bytes = traced(lambda: IntColumns(width, source))
+        dict_seconds = timed(lambda: list(dict.fromkeys(tuples)))
+        unique_seconds = timed(columns.unique)
+
+        rows = len(source)
+        per_row = f"{tuple_bytes / rows:.0f} → {column_bytes / rows:.0f}" if rows else "-"
+        print(f"{name:32} {rows:>8} {tuple_bytes / 1e6:>8.2f}MB {column_bytes / 1e6:>8.2f}MB {per_row:>11} "
+              f"{dict_seconds * 1000:>10.1f}ms {unique_seconds * 1000:>8.1f}ms")
+        totals[0] += rows
+        totals[1] += tuple_bytes
+        totals[2] += column_bytes
+        del tuples, columns
+
+    rows, tuple_bytes, column_bytes = totals
+    print(f"\n✅ {rows} junction rows: {tuple_bytes / 1e6:.2f}MB as tuples, {column_bytes / 1e6:.2f}MB as int32 columns "
+          f"({tuple_bytes / max(column_bytes, 1):.1f}x smaller)")
@@ -1,11 +1,15 @@
-import requests
-import time
-import json
 import os
+from multiprocessing import Pool
 from pathlib import Path
 from dotenv import load_dotenv
 from tqdm import tqdm
-from collections import Counter
+from services.jikan_client import JikanClient, FileTokenBucket
+from services.response_cache import ResponseCache
+from services.catalog_store import CatalogStore, migrate_json_catalog
+from services.character_store import CharacterStore, load_characters, pack_character_files, slim_characters
+from services.fetch_journal import FetchJournal, FETCHED, FAILED
+from services.refresh_scheduler import RefreshScheduler, write_delta_file
+from services.fetch_metrics import FetchMetrics
 
 load_dotenv()
 
@@ -15,100 +19,112 @@ class AnimeFetcher:
     Fetch and Save Anime as JSON
     '''
 
-    def __init__(self, continue_fetching=True, start_page=1):
-        self.base_url = os.getenv("JIKAN_BASE_URL", "https://api.jikan.moe/v4")
-        self.delay = 0.5  # Rate limiting delay
+    def __init__(self, continue_fetching=True, start_page=1, concurrency=None, workers=1, data_dir=None):
         self.continue_fetching = continue_fetching
         self.start_page = start_page
+        self.concurrency = concurrency
+        self.workers = workers
 
-        # Create data directories
-        self.data_dir = Path("data")
+        # Create data directories (DATA_DIR points the pipeline at another dataset, e.g. a synthetic one)
+        self.data_dir = Path(data_dir or os.getenv("DATA_DIR", "data"))
         self.anime_dir = self.data_dir
         self.characters_dir = self.data_dir / "characters"
 
         self.anime_dir.mkdir(parents=True, exist_ok=True)
         self.characters_dir.mkdir(parents=True, exist_ok=True)
 
-    def save_anime_json(self, anime_data, continue_fetching=True):
-        """Save anime data as JSON file"""
-        filename = self.anime_dir / "anime_data.json"
-
-        if continue_fetching and filename.exists():
-            # Load existing data and append new data
-            try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    existing_data = json.load(f)
-
-                if anime_data:
-                    existing_data.extend(anime_data)
-                    print(f"✅ Appended {len(anime_data)} new anime to existing file")
-                    anime_data = existing_data
-                else:
-                    print("⚠️  No new anime to append")
-                    return filename
-
-            except json.JSONDecodeError as e:
-                print(f"⚠️  Error reading existing JSON file: {e}. Creating new file.")
+        # Per-endpoint latency, bytes, 429s, retries, rate-limit sleep and parse/write time
+        self.metrics = FetchMetrics()
+
+        # Raw Jikan payloads are cached for revalidation and offline replay
+        self.response_cache = ResponseCache(self.data_dir / "http_cache")
+        self.client = JikanClient(  # Shared rate limiter for all requests
+            limiter=FileTokenBucket(self.rate_limit_path) if workers > 1 else None,
+            concurrency=concurrency,
+            cache=self.response_cache,
+            metrics=self.metrics
+        )
+
+        # Append-only catalog (anime_data.jsonl + anime_data.idx)
+        legacy_catalog = self.anime_dir / "anime_data.json"
+        catalog_path = self.anime_dir / "anime_data.jsonl"
+        is_new_catalog = not catalog_path.exists()
+        self.catalog = CatalogStore(catalog_path)
+        if is_new_catalog and legacy_catalog.exists():
+            self.migrate_anime_json(legacy_catalog)
+
+        # Packed, compressed character lists (data/characters_packed/)
+        self.character_store = CharacterStore(self.data_dir / "characters_packed")
+
+        # Crash-safe record of the page cursor and per-anime fetch status
+        self.journal = FetchJournal(self.data_dir / "fetch_journal.jsonl")
+
+        # Last-fetched timestamps driving the incremental refresh
+        self.refresh = RefreshScheduler(self.data_dir / "refresh_state.jsonl")
+
+    @property
+    def rate_limit_path(self):
+        """Token bucket state shared by every fetch process"""
+        return self.data_dir / "jikan_rate_limit.json"
+
+    def migrate_anime_json(self, json_path=None):
+        """Convert the legacy anime_data.json array into the append-only catalog"""
+        json_path = Path(json_path or self.anime_dir / "anime_data.json")
+        count = migrate_json_catalog(json_path, self.catalog)
+        print(f"✅ Migrated {count} anime from {json_path} to {self.catalog.path}")
+        return count
 
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(anime_data, f, ensure_ascii=False, indent=2)
-        return filename
+    def save_anime_json(self, anime_data, continue_fetching=True):
+        """Append anime data to the catalog (replace the catalog if not continuing)"""
+        if not continue_fetching:
+            self.catalog.reset()
+
+        if anime_data:
+            with self.metrics.timer("write"):
+                self.catalog.append(anime_data)
+            print(f"✅ Appended {len(anime_data)} new anime to {self.catalog.path}")
+        else:
+            print("⚠️  No new anime to append")
+        return self.catalog.path
+
+    def pack_character_files(self):
+        """Copy the loose {mal_id}_characters.json files into the packed character store"""
+        count = pack_character_files(self.characters_dir, self.character_store)
+        print(f"✅ Packed {count} character files into {self.character_store.root}")
+        return count
 
     def save_characters_json(self, mal_id, characters_data):
-        """Save characters data as JSON file"""
-        filename = self.characters_dir / f"{mal_id}_characters.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(characters_data, f, ensure_ascii=False, indent=2)
-        return filename
+        """Save characters data into the packed character store"""
+        with self.metrics.timer("write"):
+            self.character_store.put(mal_id, characters_data)
+        return self.character_store.root
 
     def load_anime_json(self):
-        """Load anime data from JSON file"""
-        filename = self.anime_dir / "anime_data.json"
-        if filename.exists():
-            with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return None
+        """Load all anime data from the catalog"""
+        if not len(self.catalog):
+            return None
+        return list(self.catalog)
 
     def load_characters_json(self, mal_id):
-        """Load characters data from JSON file"""
-        filename = self.characters_dir / f"{mal_id}_characters.json"
-        if filename.exists():
-            with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return None
+        """Load characters data from the packed store, falling back to a loose JSON file"""
+        return load_characters(self.character_store, self.characters_dir, mal_id)
 
     def get_existing_mal_ids(self):
-        """Get set of MAL IDs already in the JSON file"""
-        existing_data = self.load_anime_json()
-        return {anime['mal_id'] for anime in existing_data}
+        """Get set of MAL IDs already in the catalog (read from the index only)"""
+        return self.catalog.ids()
 
     def fetch_extract_anime_characters(self, mal_id):
         """Fetch and extract anime characters, then save to JSON file"""
         try:
-            # Fetch characters
-            characters_response = requests.get(
-                f"{self.base_url}/anime/{mal_id}/characters",
-                timeout=10
-            )
-            # If rate limited, wait and retry
-            if characters_response.status_code == 429:
-                print(f"Rate limited for {mal_id}, waiting 60 seconds...")
-                time.sleep(60)
-                characters_response = requests.get(
-                    f"{self.base_url}/anime/{mal_id}/characters",
-                    timeout=10
-                )
+            # Fetch characters (rate limiting and retries are handled by the client)
+            characters_response = self.client.get(f"/anime/{mal_id}/characters")
+            if characters_response is None:
+                return None
 
             characters_data = []
             if characters_response.status_code == 200:
-                characters_data = characters_response.json()['data']
-
-            for char in characters_data:
-                if "voice_actors" in char:
-                    char["voice_actors"] = [
-                        va for va in char["voice_actors"]
-                        if va.get("language", "").lower().strip() == "japanese"
-                    ]
+                with self.metrics.timer("parse"):
+                    characters_data = self.filter_voice_actors(characters_response.json()['data'])
 
             self.save_characters_json(mal_id, characters_data)
             return characters_data
@@ -117,7 +133,19 @@ class AnimeFetcher:
             print(f"Error fetching characters for anime {mal_id}: {e}")
             return None
 
-    def extract_anime_data(self, anime):
+    @staticmethod
+    def filter_voice_actors(characters_data):
+        """Keep only the Japanese voice actors of each character"""
+        for char in characters_data:
+            if "voice_actors" in char:
+                char["voice_actors"] = [
+                    va for va in char["voice_actors"]
+                    if va.get("language", "").lower().strip() == "japanese"
+                ]
+        return characters_data
+
+    @staticmethod
+    def extract_anime_data(anime):
         """Extract all anime fields from API response"""
         # Handle trailer
         trailer_url = None
@@ -155,103 +183,358 @@ class AnimeFetcher:
             'demographics': [{'mal_id': d['mal_id'], 'name': d['name']} for d in anime.get('demographics', [])]
         }
 
-    def fetch_top_anime_with_characters(self, limit=None):
-        """Fetch top anime with full details and characters and save them as JSON files"""
-        print(f"Fetching top {limit} anime with full details...")
+    def fetch_top_anime_with_characters(self, limit=None, resume=False):
+        """
+        Fetch top anime with full details and characters and save them to the stores.
+        Progress is journaled per page and per anime, so a crashed run can be resumed.
+        """
+        resuming = resume and self.journal.run is not None
+        if resuming:
+            limit = self.journal.run['limit']
+            page = self.journal.next_page
+            total_fetched = self.journal.run_listed
+            print(f"Resuming from page {page} ({total_fetched} anime already listed)")
+        else:
+            if not self.continue_fetching:
+                self.catalog.reset()
+            page = self.start_page
+            total_fetched = 0
+            self.journal.start_run({'start_page': page, 'limit': limit}, fresh=not self.continue_fetching)
 
-        # First, get list of top anime IDs
-        anime_data = []
-        page = self.start_page
-        total_fetched = 0
+        print(f"Fetching top {limit} anime with full details...")
 
         # Get existing MAL IDs to avoid duplicates
         existing_ids = self.get_existing_mal_ids()
         print(f"Found {len(existing_ids)} existing anime in database")
 
-        # print("Getting anime IDs...")
-        with tqdm(total=limit, desc="Fetching anime") as pbar:
+        # Worker processes fetch characters along with their pages
+        listed_chars = 0
+        if self.workers > 1:
+            page, total_fetched, listed_chars = self.list_top_anime_multiprocess(
+                limit, page, total_fetched, existing_ids, resuming
+            )
+        else:
+            page, total_fetched = self.list_top_anime(limit, page, total_fetched, existing_ids, resuming)
+
+        print(f"✅ Listed {total_fetched} anime (next page: {page})")
+
+        # Now fetch characters for every anime still pending or failed in the journal
+        mal_ids = self.journal.to_retry()
+        print(f"\nFetching characters info for {len(mal_ids)} anime...")
+        successful_chars, error_anime_id = self.fetch_journaled_characters(mal_ids)
+        # Failures while listing were journaled and retried above, so the retry's errors are the final ones
+        successful_chars += listed_chars
+
+        self.journal.compact()
+        print(f"\n✅ Successfully fetched characters for {successful_chars} anime.")
+        return total_fetched, successful_chars, error_anime_id
+
+    def list_top_anime(self, limit, page, total_fetched, existing_ids, resuming):
+        """List top anime page by page into the catalog; returns (next page, total listed)"""
+        with tqdm(total=limit, initial=total_fetched, desc="Fetching anime") as pbar:
             while limit and total_fetched < limit:
                 try:
-                    response = requests.get(
-                        f"{self.base_url}/top/anime",
-                        params={"page": page, "limit": 25}
-                    )
+                    response = self.client.get("/top/anime", params={"page": page, "limit": 25})
+                    if response is None:
+                        raise ConnectionError("no response from Jikan")
                     response.raise_for_status()
 
-                    data = response.json()
-                    for anime in data.get('data', []):
+                    with self.metrics.timer("parse"):
+                        page_data = [self.extract_anime_data(anime) for anime in response.json().get('data', [])]
+                    page_anime = []
+                    listed_ids = []
+                    for new_anime in page_data:
                         if total_fetched >= limit:
                             break
-                        new_anime = self.extract_anime_data(anime)
-                        if not new_anime['mal_id'] in existing_ids:
-                            anime_data.append(new_anime)
-                            existing_ids.add(new_anime['mal_id'])
-                            total_fetched += 1
-
+                        mal_id = new_anime['mal_id']
+                        if mal_id not in existing_ids:
+                            page_anime.append(new_anime)
+                            existing_ids.add(mal_id)
+                        elif not (resuming and mal_id not in self.journal.entries):
+                            # Already known. Only anime saved by a crash before its page was journaled are relisted
+                            pbar.update(1)
+                            continue
+                        listed_ids.append(mal_id)
+                        total_fetched += 1
                         pbar.update(1)
 
+                    # Catalog first, journal second: a crash in between re-lists this page on resume
+                    self.save_anime_json(page_anime)
+                    self.refresh.record(page_anime)
                     page += 1
-                    time.sleep(self.delay)
+                    self.journal.record_page(page, listed_ids)
+                    resuming = False
 
                 except Exception as e:
                     print(f"Error fetching anime list page {page}: {e}")
                     break
 
-        print(f"✅ Successfully fetched top {len(anime_data)} anime")
-        self.save_anime_json(anime_data, continue_fetching=self.continue_fetching)
+        return page, total_fetched
+
+    def list_top_anime_multiprocess(self, limit, page, total_fetched, existing_ids, resuming):
+        """
+        Same as list_top_anime, but pages (and their characters) are fetched by a pool
+        of worker processes sharing one file-locked rate budget. Results are merged
+        here in page order, so this process stays the only writer of every store.
+        Returns (next page, total listed, anime whose characters were fetched).
+        """
+        if not limit:
+            return page, total_fetched, 0
 
-        # Now fetch characters for each anime
-        print(f"\nFetching characters info for {len(anime_data)} anime...")
         successful_chars = 0
-        error_anime_id = []
+        next_page = page
+        in_flight = {}
+
+        with Pool(self.workers, initializer=_init_fetch_worker,
+                  initargs=(str(self.data_dir), existing_ids, self.concurrency)) as pool, \
+                tqdm(total=limit, initial=total_fetched, desc=f"Fetching anime ({self.workers} workers)") as pbar:
+
+            def submit():
+                nonlocal next_page
+                in_flight[next_page] = pool.apply_async(_fetch_page_worker, (next_page,))
+                next_page += 1
+
+            for _ in range(self.workers):
+                submit()
 
-        with tqdm(total=len(anime_data), desc="Fetching anime characters") as pbar:
-            for anime in anime_data:
+            while in_flight:
+                current = min(in_flight)
                 try:
-                    # Fetch anime details and characters
+                    anime_list, characters, worker_metrics = in_flight.pop(current).get()
+                except Exception as e:
+                    # Later pages are dropped too, so the journaled page cursor stays contiguous
+                    print(f"Error fetching anime list page {current}: {e}")
+                    break
+                self.metrics.merge(worker_metrics)
+                if not anime_list:
+                    break  # past the last page
+
+                page_anime = []
+                listed_ids = []
+                for anime in anime_list:
+                    if total_fetched >= limit:
+                        break
                     mal_id = anime['mal_id']
-                    characters_data = self.fetch_extract_anime_characters(mal_id)
+                    if mal_id not in existing_ids:
+                        page_anime.append(anime)
+                        existing_ids.add(mal_id)
+                    elif not (resuming and mal_id not in self.journal.entries):
+                        continue
+                    listed_ids.append(mal_id)
+                    total_fetched += 1
+
+                self.save_anime_json(page_anime)
+                self.refresh.record(page_anime)
+                page = current + 1
+                self.journal.record_page(page, listed_ids)
+                resuming = False
+
+                listed = set(listed_ids)
+                successful, _ = self.store_character_results([(m, c) for m, c in characters if m in listed])
+                successful_chars += successful
+                pbar.update(len(listed_ids))
+
+                if total_fetched < limit:
+                    submit()
+                else:
+                    # Pages still in flight are beyond the limit
+                    break
 
-                    if characters_data:
-                        successful_chars += 1
-                    else:
-                        error_anime_id.append(mal_id)
+        return page, total_fetched, successful_chars
 
-                    # time.sleep(self.delay)
-                    pbar.update(1)
+    def store_character_results(self, results):
+        """Save [(mal_id, characters or exception)] and record each outcome in the journal"""
+        successful_chars = 0
+        error_anime_id = []
+        to_save = []
+
+        for mal_id, characters_data in results:
+            if isinstance(characters_data, Exception):
+                self.journal.mark_failed(mal_id, characters_data)
+                error_anime_id.append(mal_id)
+                continue
+            to_save.append((mal_id, characters_data))
+            if characters_data:
+                self.journal.mark_fetched(mal_id)
+                successful_chars += 1
+            else:
+                self.journal.mark_failed(mal_id, "no characters returned")
+                error_anime_id.append(mal_id)
 
-                except Exception as e:
-                    print(f"\nError processing characters for anime {mal_id}: {e}")
-                    pbar.update(1)
-                    continue
+        with self.metrics.timer("write"):
+            self.character_store.put_many(to_save)
+        return successful_chars, error_anime_id
 
-        print(f"\n✅ Successfully fetched characters for {successful_chars} anime.")
-        return len(anime_data), successful_chars, error_anime_id
+    def fetch_journaled_characters(self, mal_ids):
+        """Fetch characters concurrently, recording fetched/failed per anime in the journal"""
+        successful_chars = 0
+        error_anime_id = []
+
+        self.journal.mark_pending([mal_id for mal_id in mal_ids if mal_id not in self.journal.entries])
+        if self.workers > 1:
+            return self.fetch_characters_multiprocess(mal_ids)
+
+        with tqdm(total=len(mal_ids), desc="Fetching anime characters") as pbar:
+            for mal_id, characters_data in self.fetch_characters_concurrently(mal_ids):
+                if isinstance(characters_data, Exception):
+                    print(f"\nError processing characters for anime {mal_id}: {characters_data}")
+                    self.journal.mark_failed(mal_id, characters_data)
+                    error_anime_id.append(mal_id)
+                elif characters_data:
+                    self.journal.mark_fetched(mal_id)
+                    successful_chars += 1
+                else:
+                    self.journal.mark_failed(mal_id, "no characters returned")
+                    error_anime_id.append(mal_id)
+                pbar.update(1)
+
+        return successful_chars, error_anime_id
 
-    def find_missing_character_files(self,
-                                     anime_data_path="data/anime_data.json",
-                                     characters_dir="data/characters"
-                                     ):
+    def fetch_characters_multiprocess(self, mal_ids, chunk_size=25):
+        """Split the id list across worker processes; results are stored by this process"""
+        successful_chars = 0
+        error_anime_id = []
+        chunks = [mal_ids[i:i + chunk_size] for i in range(0, len(mal_ids), chunk_size)]
+
+        with Pool(self.workers, initializer=_init_fetch_worker,
+                  initargs=(str(self.data_dir), set(), self.concurrency)) as pool, \
+                tqdm(total=len(mal_ids), desc=f"Fetching anime characters ({self.workers} workers)") as pbar:
+            for results, worker_metrics in pool.imap_unordered(_fetch_ids_worker, chunks):
+                self.metrics.merge(worker_metrics)
+                successful, errors = self.store_character_results(results)
+                successful_chars += successful
+                error_anime_id.extend(errors)
+                pbar.update(len(results))
+
+        return successful_chars, error_anime_id
+
+    def fetch_characters_concurrently(self, mal_ids):
+        """Fetch characters for many anime on the client's worker pool, yielding (mal_id, characters)"""
+        yield from self.client.map(self.fetch_extract_anime_characters, mal_ids)
+
+    def refresh_anime(self, mal_id):
+        """Re-fetch one anime and its characters; returns True if anything changed"""
+        response = self.client.get(f"/anime/{mal_id}")
+        if response is None or response.status_code != 200:
+            raise ConnectionError(f"status {getattr(response, 'status_code', None)}")
+
+        # A failed characters request is a refresh error: the stored list, the refresh
+        # timestamp and the delta are left untouched, so the anime is retried next run
+        characters_response = self.client.get(f"/anime/{mal_id}/characters")
+        if characters_response is None or characters_response.status_code != 200:
+            raise ConnectionError(f"characters status {getattr(characters_response, 'status_code', None)}")
+
+        with self.metrics.timer("parse"):
+            new_anime = self.extract_anime_data(response.json()['data'])
+            new_characters = slim_characters(self.filter_voice_actors(characters_response.json()['data']))
+
+        anime_changed = new_anime != self.catalog.get(mal_id)
+        if anime_changed:
+            with self.metrics.timer("write"):
+                self.catalog.append([new_anime], refresh=True)
+
+        # Only a changed list is written (the shards are append-only)
+        characters_changed = new_characters != self.character_store.get(mal_id)
+        if characters_changed:
+            self.save_characters_json(mal_id, new_characters)
+
+        self.refresh.record([new_anime])
+        return anime_changed or characters_changed
+
+    def refresh_catalog(self, hot=100, budget=None):
         """
-        Compare anime_data.json with characters folder and
-        return anime MAL IDs that are missing character files.
+        Re-fetch the hottest and most overdue anime already in the catalog and
+        write the ids that actually changed to a delta file (data/deltas/).
         """
+        catalog_ids = self.catalog.ids()
+
+        # Anime fetched before timestamps were kept count as fetched when the catalog was last written
+        unseen = catalog_ids - self.refresh.state.keys()
+        if unseen:
+            self.refresh.record(
+                [self.catalog.get(mal_id) for mal_id in unseen],
+                fetched_at=self.catalog.path.stat().st_mtime
+            )
+
+        mal_ids = self.refresh.schedule(catalog_ids, hot=hot, budget=budget)
+        print(f"Refreshing {len(mal_ids)} of {len(catalog_ids)} anime...")
 
-        anime_data_path = Path(anime_data_path)
-        characters_dir = Path(characters_dir)
+        changed_ids = []
+        error_anime_id = []
+        with tqdm(total=len(mal_ids), desc="Refreshing anime") as pbar:
+            for mal_id, changed in self.client.map(self.refresh_anime, mal_ids):
+                if isinstance(changed, Exception):
+                    print(f"\nError refreshing anime {mal_id}: {changed}")
+                    error_anime_id.append(mal_id)
+                elif changed:
+                    changed_ids.append(mal_id)
+                pbar.update(1)
+
+        delta_path = write_delta_file(self.data_dir / "deltas", changed_ids, source="refresh")
+        print(f"✅ {len(changed_ids)} anime changed, delta written to {delta_path}")
+        return changed_ids, error_anime_id, delta_path
+
+    def replay_from_cache(self, limit=None):
+        """
+        Rebuild the catalog and character store from cached responses only.
+        The top-anime pages are replayed from `start_page` until the first uncached page
+        (or until `limit` anime have been replayed).
+        """
+        replay = JikanClient(cache=self.response_cache, offline=True, metrics=self.metrics)
+        anime_data = []
+        seen = set()
+        page = self.start_page
 
-        # Load anime data
-        with anime_data_path.open("r", encoding="utf-8") as f:
-            anime_list = json.load(f)
+        while True:
+            response = replay.get("/top/anime", params={"page": page, "limit": 25})
+            if response is None or response.status_code != 200:
+                break
+            for anime in response.json().get('data', []):
+                new_anime = self.extract_anime_data(anime)
+                if new_anime['mal_id'] not in seen:
+                    seen.add(new_anime['mal_id'])
+                    anime_data.append(new_anime)
+            page += 1
+            if limit and len(anime_data) >= limit:
+                anime_data = anime_data[:limit]
+                break
+
+        self.catalog.reset()
+        self.catalog.append(anime_data)
+        print(f"✅ Replayed {len(anime_data)} anime from {page - self.start_page} cached pages")
+
+        characters = []
+        missing = []
+        for anime in tqdm(anime_data, desc="Replaying characters"):
+            response = replay.get(f"/anime/{anime['mal_id']}/characters")
+            if response is None or response.status_code != 200:
+                missing.append(anime['mal_id'])
+                continue
+            characters.append((anime['mal_id'], self.filter_voice_actors(response.json()['data'])))
+
+        self.character_store.reset()
+        self.character_store.put_many(characters)
+        print(f"✅ Replayed characters for {len(characters)} anime ({len(missing)} not cached)")
+        return len(anime_data), len(characters), missing
+
+    def write_metrics(self):
+        """Write this run's fetch metrics to data/metrics/fetch_<timestamp>.json"""
+        path = self.metrics.write_summary(self.data_dir / "metrics")
+        print(self.metrics.status_line())
+        print(f"✅ Fetch metrics written to {path}")
+        return path
+
+    def find_missing_character_files(self):
+        """
+        Compare the catalog with the character store index and the fetch journal
+        and return anime MAL IDs that are missing characters (no directory scan).
+        """
 
         # Collect all anime MAL IDs
-        anime_ids = {anime["mal_id"] for anime in anime_list}
+        anime_ids = self.catalog.ids()
 
-        # Collect MAL IDs that already have character files
-        existing_character_ids = {
-            int(p.stem.replace("_characters", ""))
-            for p in characters_dir.glob("*_characters.json")
-        }
+        # Collect MAL IDs that already have characters
+        existing_character_ids = self.character_store.ids() | set(self.journal.ids_with_status(FETCHED))
 
         # Find missing
         missing_ids = sorted(anime_ids - existing_character_ids)
@@ -260,26 +543,85 @@ class AnimeFetcher:
             "total_anime": len(anime_ids),
             "character_files_found": len(existing_character_ids),
             "missing_count": len(missing_ids),
-            "missing_ids": missing_ids
+            "missing_ids": missing_ids,
+            "failed": {
+                mal_id: self.journal.entries[mal_id]
+                for mal_id in self.journal.ids_with_status(FAILED)
+            },
+            "journal": self.journal.summary()
         }
 
-    def get_duplicate_anime_records(self, path="data/anime_data.json"):
-        with open(path, "r", encoding="utf-8") as f:
-            anime_list = json.load(f)
-
-        seen = {}
+    def get_duplicate_anime_records(self):
+        """Records re-appended for the same MAL ID by a plain append (refreshes supersede on purpose)"""
+        refreshed = self.catalog.refreshed_offsets()
+        previous = {}
         duplicates = []
 
-        for anime in anime_list:
+        for offset, anime in self.catalog.scan():
             mal_id = anime["mal_id"]
-            if mal_id in seen:
-                duplicates.append((seen[mal_id], anime))
-            else:
-                seen[mal_id] = anime
+            if mal_id in previous and offset not in refreshed:
+                duplicates.append((previous[mal_id], anime))
+            previous[mal_id] = anime
 
         return duplicates
 
 
+# ========== MULTI-PROCESS WORKERS ==========
+# Worker processes only talk to Jikan (through the shared file-locked token bucket);
+# every store is written by the parent process, so merged results never collide.
+
+_worker = {}
+
+
+def _init_fetch_worker(data_dir, existing_ids, concurrency):
+    data_dir = Path(data_dir)
+    _worker['metrics'] = FetchMetrics()
+    _worker['client'] = JikanClient(
+        limiter=FileTokenBucket(data_dir / "jikan_rate_limit.json"),
+        concurrency=concurrency,
+        cache=ResponseCache(data_dir / "http_cache"),
+        metrics=_worker['metrics']
+    )
+    _worker['existing_ids'] = existing_ids
+
+
+def _fetch_characters_worker(mal_id):
+    response = _worker['client'].get(f"/anime/{mal_id}/characters")
+    if response is None:
+        raise ConnectionError("no response from Jikan")
+    if response.status_code != 200:
+        return []
+    with _worker['metrics'].timer("parse"):
+        return AnimeFetcher.filter_voice_actors(response.json()['data'])
+
+
+def _fetch_ids(mal_ids):
+    return list(_worker['client'].map(_fetch_characters_worker, mal_ids))
+
+
+def _fetch_ids_worker(mal_ids):
+    """
+    Fetch characters for a chunk of anime: ([(mal_id, characters or exception)], metrics),
+    where metrics covers this task only and is merged by the parent
+    """
+    results = _fetch_ids(mal_ids)
+    return results, _worker['metrics'].snapshot(reset=True)
+
+
+def _fetch_page_worker(page):
+    """Fetch one top-anime page plus the characters of its new anime"""
+    response = _worker['client'].get("/top/anime", params={"page": page, "limit": 25})
+    if response is None:
+        raise ConnectionError("no response from Jikan")
+    response.raise_for_status()
+
+    with _worker['metrics'].timer("parse"):
+        anime_list = [AnimeFetcher.extract_anime_data(anime) for anime in response.json().get('data', [])]
+    new_ids = [anime['mal_id'] for anime in anime_list if anime['mal_id'] not in _worker['existing_ids']]
+    characters = _fetch_ids(new_ids)
+    return anime_list, characters, _worker['metrics'].snapshot(reset=True)
+
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Anime Data Fetcher")
@@ -288,25 +630,58 @@ if __name__ == "__main__":
     parser.add_argument('--page', type=int, default=1,
                         help='Page number to start fetching from (default: 1)')
     parser.add_argument('--continue', dest='continue_fetch', action='store_true',
-                        help='Continue fetching and append to existing anime_data.json')
+                        help='Continue fetching and append to the existing catalog')
     parser.add_argument('--limit', type=int, default=None,
                         help='Total number of anime to fetch (default: None = fetch all pages)')
     parser.add_argument('--check', dest='check', action='store_true',
                         help='Check missing anime characters')
+    parser.add_argument('--resume', dest='resume', action='store_true',
+                        help='Resume the last run from its journal and retry only failed anime')
+    parser.add_argument('--refresh', type=int, default=None, metavar='N',
+                        help='Re-fetch the N highest-priority anime plus every overdue one, write a delta file')
+    parser.add_argument('--refresh-budget', dest='refresh_budget', type=int, default=None,
+                        help='Maximum number of anime re-fetched by --refresh')
+    parser.add_argument('--replay', dest='replay', action='store_true',
+                        help='Rebuild the catalog and characters from the HTTP cache, without network access')
+    parser.add_argument('--migrate', dest='migrate', action='store_true',
+                        help='Convert data/anime_data.json into the append-only catalog and exit')
+    parser.add_argument('--pack-characters', dest='pack_characters', action='store_true',
+                        help='Pack data/characters/*.json into the compressed character store and exit')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='Number of concurrent requests (default: JIKAN_CONCURRENCY or 4)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of fetch processes sharing one rate budget (default: 1)')
+    parser.add_argument('--live-metrics', dest='live_metrics', type=float, nargs='?', const=10.0, default=None,
+                        metavar='SECONDS', help='Print request metrics every SECONDS while fetching (default: 10)')
     args = parser.parse_args()
 
     fetcher = AnimeFetcher(
         continue_fetching=args.continue_fetch,
-        start_page=args.page
+        start_page=args.page,
+        concurrency=args.concurrency,
+        workers=args.workers
     )
 
     print("=" * 50)
     print("FETCHING DATA FROM JIKAN API")
     print("=" * 50)
 
-    if args.check:
+    fetches = not (args.migrate or args.pack_characters or args.check)
+    stop_reporter = fetcher.metrics.start_live_reporter(args.live_metrics) if fetches and args.live_metrics else None
+
+    if args.refresh is not None:
+        fetcher.refresh_catalog(hot=args.refresh, budget=args.refresh_budget)
+    elif args.replay:
+        fetcher.replay_from_cache(limit=args.limit)
+    elif args.migrate:
+        fetcher.migrate_anime_json()
+    elif args.pack_characters:
+        fetcher.pack_character_files()
+    elif args.check:
         result = fetcher.find_missing_character_files()
         print(result)
+        if not len(fetcher.character_store) and any(fetcher.characters_dir.glob("*_characters.json")):
+            print("⚠️  Loose character files are not counted, run with --pack-characters first")
         dupes = fetcher.get_duplicate_anime_records()
         for original, duplicate in dupes:
             print("Original:", original["title"])
@@ -314,16 +689,21 @@ if __name__ == "__main__":
     elif args.mal_ids:
         # User gave specific mal_ids → fetch only these
         print(f"\nFetching characters for MAL IDs: {args.mal_ids}")
-        for id in args.mal_ids:
-            fetcher.fetch_extract_anime_characters(id)
+        fetcher.fetch_journaled_characters(args.mal_ids)
     else:
         # Normal full fetching
         print(f"\nFetching from page {args.page}")
-        anime_count, char_count, error_anime_id = fetcher.fetch_top_anime_with_characters(limit=args.limit)
+        anime_count, char_count, error_anime_id = fetcher.fetch_top_anime_with_characters(
+            limit=args.limit, resume=args.resume
+        )
         print(f"\nFetched: {anime_count} anime, {char_count} with characters")
         print(f"Anime that couldn't fetch characters: {error_anime_id}")
 
         if error_anime_id:
             print(f"\nFetching characters again for MAL IDs: {error_anime_id}")
-            for id in error_anime_id:
-                fetcher.fetch_extract_anime_characters(id)
+            fetcher.fetch_journaled_characters(fetcher.journal.to_retry())
+
+    if stop_reporter:
+        stop_reporter.set()
+    if fetches:
+        fetcher.write_metrics()
@@ -0,0 +1,185 @@
+# Synthetic anime catalog generator for scale testing the load / index pipeline
+# Writes a catalog (anime_data.jsonl, same records as the fetcher) and a packed
+# character store into --data-dir, deterministically from --seed. The distributions
+# follow the real top-3k dataset: ~30 characters per anime (long tail), recurring
+# characters within a franchise, ~1 Japanese voice actor per character drawn from a
+# heavily skewed pool, 0-6 genres out of ~20, and a few dozen themes.
+#
+# Usage:
+#   python -m scripts.generate_synthetic --count 30000 --data-dir data/synthetic
+#   DATA_DIR=data/synthetic python -m scripts.load_anime
+
+import argparse
+import math
+import random
+from pathlib import Path
+
+from tqdm import tqdm
+
+from services.catalog_store import CatalogStore
+from services.character_store import CharacterStore
+
+GENRES = [
+    (1, "Action"), (2, "Adventure"), (4, "Comedy"), (8, "Drama"), (10, "Fantasy"), (14, "Horror"),
+    (7, "Mystery"), (22, "Romance"), (24, "Sci-Fi"), (36, "Slice of Life"), (30, "Sports"),
+    (37, "Supernatural"), (41, "Suspense"), (46, "Award Winning"), (5, "Avant Garde"),
+    (47, "Gourmet"), (26, "Girls Love"), (28, "Boys Love"), (9, "Ecchi"),
+]
+DEMOGRAPHICS = [(27, "Shounen"), (42, "Seinen"), (25, "Shoujo"), (43, "Josei"), (15, "Kids")]
+THEMES = [(mal_id, f"Theme {mal_id}") for mal_id in range(50, 101)]
+TYPES = (["TV"] * 60) + (["Movie"] * 15) + (["OVA"] * 10) + (["ONA"] * 8) + (["Special"] * 7)
+SOURCES = ["Manga", "Original", "Light novel", "Visual novel", "Web manga", "Novel", "Game", "4-koma manga"]
+STATUSES = (["Finished Airing"] * 90) + (["Currently Airing"] * 8) + (["Not yet aired"] * 2)
+RATINGS = ["PG-13 - Teens 13 or older", "R - 17+ (violence & profanity)", "PG - Children", "R+ - Mild Nudity"]
+SEASONS = ["winter", "spring", "summer", "fall"]
+WORDS = (
+    "the a of and to in is his her their world new story young girl boy school city war power "
+    "secret life friends journey after must find demon magic team love past future battle "
+    "family strange day night dream last first hero village kingdom ship space sea"
+).split()
+
+IMAGE_URL = "https://cdn.myanimelist.net/images/{kind}/{mal_id}.{ext}"
+
+
+class SyntheticCatalog:
+    """
+    Deterministic generator of anime records and their character lists.
+
+    Entity id ranges (studios, characters, voice actors) grow with the catalog, so
+    cardinalities and sharing scale like the real data instead of staying fixed.
+    """
+
+    def __init__(self, count, seed=42):
+        self.count = count
+        self.rng = random.Random(seed)
+        self.studio_scale = max(2, count // 300)
+        self.voice_actor_scale = max(10, count // 10)  # ~5.6k voice actors, top one in 360 roles for 3k anime
+        self.next_character_id = 1
+        self.character_va = {}  # character mal_id -> Japanese voice actor ids (stable across appearances)
+        self.franchise = []  # characters of the current franchise, reused by its sequels
+
+    def popular(self, scale, shape=1.5):
+        """Id drawn from a long-tailed (Pareto) distribution: a few very busy studios / voice actors"""
+        return int(scale * (self.rng.paretovariate(shape) - 1)) + 1
+
+    def text(self, words):
+        return " ".join(self.rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+    def anime(self, mal_id):
+        rng = self.rng
+        year = rng.randint(1970, 2025)
+        studio_id = self.popular(self.studio_scale)
+        return {
+            'mal_id': mal_id,
+            'image_url': IMAGE_URL.format(kind="anime", mal_id=mal_id, ext="webp"),
+            'trailer_url': f"https://www.youtube.com/embed/synthetic{mal_id}" if rng.random() < 0.6 else None,
+            'title': f"{self.text(rng.randint(1, 4))[:-1]} {mal_id}",
+            'title_english': f"{self.text(rng.randint(1, 4))[:-1]} {mal_id}" if rng.random() < 0.7 else None,
+            'title_japanese': f"アニメ {mal_id}",
+            'title_synonyms': [f"Synonym {mal_id}-{n}" for n in range(rng.choice((0, 0, 1, 2)))],
+            'synopsis': self.text(max(10, int(rng.gauss(120, 40)))),
+            'type': rng.choice(TYPES),
+            'source': rng.choice(SOURCES),
+            'episodes': max(1, int(rng.lognormvariate(2.5, 0.8))),
+            'status': rng.choice(STATUSES),
+            'aired': f"Apr {rng.randint(1, 28)}, {year} to Sep {rng.randint(1, 28)}, {year}",
+            'duration': f"{rng.choice((12, 23, 24, 25, 90))} min per ep",
+            'rating': rng.choice(RATINGS),
+            'score': round(min(9.3, max(5.0, rng.gauss(7.3, 0.6))), 2),
+            'popularity': mal_id,
+            'season': rng.choice(SEASONS),
+            'year': year,
+            'studios': [{'mal_id': studio_id, 'name': f"Studio {studio_id}"}],
+            'genres': [{'mal_id': g, 'name': n} for g, n in rng.sample(GENRES, min(6, int(rng.expovariate(1 / 3.4))))],
+            'themes': [{'mal_id': t, 'name': n} for t, n in rng.sample(THEMES, rng.choice((0, 0, 1, 1, 2, 3)))],
+            'demographics': [{'mal_id': d, 'name': n} for d, n in rng.sample(DEMOGRAPHICS, rng.choice((0, 1, 1)))],
+        }
+
+    def character_entry(self, character_id, role):
+        rng = self.rng
+        if character_id not in self.character_va:
+            voices = rng.choices((0, 1, 2), weights=(11, 87, 2))[0]
+            self.character_va[character_id] = [self.popular(self.voice_actor_scale) for _ in range(voices)]
+        return {
+            'character': {
+                'mal_id': character_id,
+                'name': f"Character {character_id}",
+                'images': {
+                    'jpg': {'image_url': IMAGE_URL.format(kind="characters", mal_id=character_id, ext="jpg")},
+                    'webp': {'image_url': IMAGE_URL.format(kind="characters", mal_id=character_id, ext="webp")},
+                },
+            },
+            'role': role,
+            'favorites': min(200000, int(rng.paretovariate(0.6)) - 1) if rng.random() < 0.6 else 0,
+            'voice_actors': [
+                {
+                    'person': {
+                        'mal_id': va_id,
+                        'name': f"Voice Actor {va_id}",
+                        'images': {'jpg': {'image_url': IMAGE_URL.format(kind="voiceactors", mal_id=va_id, ext="jpg")}},
+                    },
+                    'language': "Japanese",
+                }
+                for va_id in self.character_va[character_id]
+            ],
+        }
+
+    def characters(self):
+        """Character list of the next anime (sequels reuse part of their franchise's cast)"""
+        rng = self.rng
+        if rng.random() < 0.55:  # new franchise
+            self.franchise = []
+        if rng.random() < 0.017:
+            return []
+
+        size = min(2000, max(1, int(rng.lognormvariate(math.log(21), 0.8))))
+        reused = rng.sample(self.franchise, min(len(self.franchise), int(size * 0.7)))
+        cast = reused + list(range(self.next_character_id, self.next_character_id + size - len(reused)))
+        self.next_character_id += size - len(reused)
+        self.franchise = list(dict.fromkeys(self.franchise + cast))
+
+        return [
+            self.character_entry(character_id, "Main" if rng.random() < 0.12 else "Supporting")
+            for character_id in cast
+        ]
+
+    def __iter__(self):
+        """Yield (anime, characters) for mal_id 1..count"""
+        for mal_id in range(1, self.count + 1):
+            yield self.anime(mal_id), self.characters()
+
+
+def generate(data_dir, count, seed=42, batch_size=1000):
+    """Replace the catalog and character store in `data_dir` with `count` synthetic anime"""
+    data_dir = Path(data_dir)
+    catalog = CatalogStore(data_dir / "anime_data.jsonl")
+    store = CharacterStore(data_dir / "characters_packed")
+    catalog.reset()
+    store.reset()
+
+    anime_batch, character_batch = [], []
+    characters = 0
+    for anime, character_list in tqdm(SyntheticCatalog(count, seed), total=count, desc="Generating", ncols=80):
+        anime_batch.append(anime)
+        character_batch.append((anime['mal_id'], character_list))
+        characters += len(character_list)
+        if len(anime_batch) >= batch_size:
+            catalog.append(anime_batch)
+            store.put_many(character_batch)
+            anime_batch, character_batch = [], []
+    catalog.append(anime_batch)
+    store.put_many(character_batch)
+
+    print(f"✅ Generated {count} anime ({characters} character entries) in {data_dir}")
+    return characters
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic anime catalog and character store")
+    parser.add_argument('--count', type=int, default=30000, help='Number of anime (default: 30000)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (same seed and count, same data)')
+    parser.add_argument('--data-dir', dest='data_dir', default="data/synthetic",
+                        help='Output directory (its catalog and character store are replaced)')
+    args = parser.parse_args()
+
+    generate(args.data_dir, args.count, args.seed)
@@ -1,15 +1,32 @@
 from services.elasticsearch_service import ElasticsearchService
 from services.database import Database
+from services.refresh_scheduler import load_delta_file
 import argparse
+import time
+from datetime import datetime
 
 if __name__ == "__main__":
-    # parser = argparse.ArgumentParser(
-    #     description="Elasticsearch indexing script"
-    # )
+    parser = argparse.ArgumentParser(
+        description="Elasticsearch indexing script"
+    )
 
     # parser.add_argument("--delete", action="store_true", help="Delete all Elasticsearch indices before indexing")
+    parser.add_argument("--delta", default=None,
+                        help="Delta file of changed MAL IDs (data/deltas/changed_*.json); upsert only those anime")
+    parser.add_argument("--sql-documents", dest="sql_documents", action="store_true",
+                        help="Build the anime documents in PostgreSQL and send its JSON to Elasticsearch as is")
+    parser.add_argument("--keep", type=int, default=3,
+                        help="Index generations kept after a full reindex, including the live one (default: 3)")
+    parser.add_argument("--min-ratio", dest="min_ratio", type=float, default=0.9,
+                        help="Reject a new generation with fewer documents than this fraction of the live one")
+    parser.add_argument("--since", nargs="?", const="watermark", default=None, metavar="TIMESTAMP",
+                        help="Incremental: upsert only anime changed since the stored watermark (or TIMESTAMP, ISO format)")
+    parser.add_argument("--loop", type=float, default=None, metavar="SECONDS",
+                        help="Incremental, repeated every SECONDS (implies --since)")
+    parser.add_argument("--rollback", nargs="?", const="previous", default=None, metavar="GENERATION",
+                        help="Point the aliases back to an earlier generation (default: the previous one) and exit")
 
-    # args = parser.parse_args()
+    args = parser.parse_args()
 
     print("=" * 50)
     print("ELASTICSEARCH INDEXING SCRIPT")
@@ -18,9 +35,11 @@ if __name__ == "__main__":
     # Check if Elasticsearch is running
     es = ElasticsearchService()
 
-    # Delete indices if exist
-    print("\n⚠️ Deleting all Elasticsearch indices...")
-    es.delete_indices()
+    if args.rollback:
+        es.rollback(None if args.rollback == "previous" else args.rollback)
+        raise SystemExit(0)
+
+    mal_ids = load_delta_file(args.delta) if args.delta else None
 
     # Connect to database
     print("Connecting to PostgreSQL...")
@@ -31,4 +50,19 @@ if __name__ == "__main__":
     print("INDEXING ANIME DATA")
     print("=" * 30)
 
-    es.index_all_data(db)
+    if args.since or args.loop:
+        # Incremental: only what changed since the watermark, optionally forever
+        since = datetime.fromisoformat(args.since) if args.since not in (None, "watermark") else None
+        while True:
+            es.index_changes(db, since=since, sql_documents=args.sql_documents)
+            if not args.loop:
+                break
+            since = None
+            time.sleep(args.loop)
+    elif mal_ids is None:
+        # Full reindex into a new generation; searches use the live one until the alias swap
+        es.reindex(db, sql_documents=args.sql_documents, keep=args.keep, min_ratio=args.min_ratio)
+    else:
+        # A delta run upserts only these anime (and the suggestions of their categories)
+        # into the live indices through their aliases
+        es.index_all_data(db, mal_ids=mal_ids, sql_documents=args.sql_documents)
@@ -1,5 +1,19 @@
+import hashlib
+import json
+import queue
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from itertools import islice
+from pathlib import Path
+from types import SimpleNamespace
 from tqdm import tqdm
+from services.character_store import CharacterStore, load_characters
 from services.database import Database
+from services.staging_buffers import IntColumns
+from services.refresh_scheduler import load_delta_file, write_delta_file
 from scripts.fetch_anime import AnimeFetcher
 
 
@@ -8,10 +22,76 @@ class AnimeLoader:
     This class helps building staging lists to speed up the insert to database
     """
 
-    def __init__(self):
-        self.db = Database()
-        self.fetcher = AnimeFetcher()
-
+    # Staging lists in insert order: every entity table comes before the junctions referencing it
+    STAGING_LISTS = (
+        'anime_rows', 'studio_rows', 'anime_studios',
+        'genre_rows', 'anime_genres', 'theme_rows', 'anime_themes',
+        'demographic_rows', 'anime_demographics',
+        'character_rows', 'anime_characters', 'voice_actor_rows', 'anime_characters_voice_actors',
+        'manifest_rows',
+    )
+
+    # Target table of each staging list (for the COPY path)
+    STAGING_TABLES = {
+        'anime_rows': 'anime', 'studio_rows': 'studios', 'anime_studios': 'anime_studios',
+        'genre_rows': 'genres', 'anime_genres': 'anime_genres',
+        'theme_rows': 'themes', 'anime_themes': 'anime_themes',
+        'demographic_rows': 'demographics', 'anime_demographics': 'anime_demographics',
+        'character_rows': 'characters', 'anime_characters': 'anime_characters',
+        'voice_actor_rows': 'voice_actors', 'anime_characters_voice_actors': 'anime_character_voice_actors',
+        'manifest_rows': 'anime_manifest',
+    }
+
+    # Staging lists that must be loaded before each junction list (foreign keys)
+    STAGING_DEPENDENCIES = {
+        'anime_studios': ('anime_rows', 'studio_rows'),
+        'anime_genres': ('anime_rows', 'genre_rows'),
+        'anime_themes': ('anime_rows', 'theme_rows'),
+        'anime_demographics': ('anime_rows', 'demographic_rows'),
+        'anime_characters': ('anime_rows', 'character_rows'),
+        'anime_characters_voice_actors': ('anime_rows', 'character_rows', 'voice_actor_rows'),
+        # Hashes are recorded last, so an anime whose rows failed to load is retried next time
+        'manifest_rows': tuple(name for name in STAGING_LISTS if name != 'manifest_rows'),
+    }
+
+    # Junction lists replaced per anime by sync mode (links missing upstream are deleted)
+    SYNCED_LISTS = (
+        'anime_studios', 'anime_genres', 'anime_themes', 'anime_demographics',
+        'anime_characters', 'anime_characters_voice_actors',
+    )
+
+    # Int-only junction lists (and their width), held as int32 columns instead of tuples
+    INT_COLUMN_LISTS = {
+        'anime_studios': 2, 'anime_genres': 2, 'anime_themes': 2, 'anime_demographics': 2,
+        'anime_characters_voice_actors': 3,
+    }
+
+    def __init__(self, use_copy=False, parallel=1, atomic=False, synchronous_commit=True, skip_unchanged=False,
+                 sync_links=False, stage_workers=1, stage_chunk_size=100, data_dir=None,
+                 defer_indexes=False, index_workers=4, maintenance_work_mem="512MB"):
+        self.use_copy = use_copy  # COPY into temp staging tables instead of execute_values
+        self.parallel = parallel  # tables loaded concurrently, each on its own connection
+        self.atomic = atomic  # whole load in one transaction on one connection
+        self.synchronous_commit = synchronous_commit
+        self.skip_unchanged = skip_unchanged  # only load anime whose content hash changed
+        self.sync_links = sync_links  # diff junction tables per anime instead of insert-only
+        self.link_changes = {}  # junction list -> [added, removed] in sync mode
+        self.stage_workers = stage_workers  # processes parsing character lists while staging
+        self.stage_chunk_size = stage_chunk_size  # anime per staging task
+        self._stage_pool = None
+        self.defer_indexes = defer_indexes  # drop secondary indexes for the load, rebuild them after
+        self.index_workers = index_workers  # indexes rebuilt concurrently
+        self.maintenance_work_mem = maintenance_work_mem  # per index build
+
+        # Content hash per loaded anime (from anime_manifest when skipping unchanged anime)
+        self.manifest = {}
+        self.changed_ids = []
+        self.skipped = 0
+        self.db = Database(pool_size=max(parallel, index_workers) + 1)  # a connection per concurrent load / index build
+        self.fetcher = AnimeFetcher(data_dir=data_dir)
+        self.reset_staging_lists()
+
+    def reset_staging_lists(self):
         # Staging lists
         self.anime_rows = []
         self.studio_rows = []
@@ -19,165 +99,546 @@ class AnimeLoader:
         self.theme_rows = []
         self.demographic_rows = []
 
-        self.anime_studios = []
-        self.anime_genres = []
-        self.anime_themes = []
-        self.anime_demographics = []
+        self.anime_studios = new_staging_list('anime_studios')
+        self.anime_genres = new_staging_list('anime_genres')
+        self.anime_themes = new_staging_list('anime_themes')
+        self.anime_demographics = new_staging_list('anime_demographics')
 
         self.character_rows = []
         self.voice_actor_rows = []
 
         self.anime_characters = []  # (anime_id, character_id, role)
-        self.anime_characters_voice_actors = []  # (anime_id, character_id, voice_actor_id)
+        self.anime_characters_voice_actors = new_staging_list('anime_characters_voice_actors')  # (anime_id, character_id, voice_actor_id)
 
-    def build_staging_lists(self):
-        print("\nBuilding staging lists...")
+        self.manifest_rows = []  # (anime_id, content_hash)
 
-        anime_list = self.fetcher.load_anime_json()
+    def iter_anime(self, mal_ids=None):
+        """Stream anime from the catalog (or only the anime listed in a delta file)"""
+        if mal_ids is None:
+            return iter(self.fetcher.catalog)
+        # Random access into the catalog
+        return (anime for anime in map(self.fetcher.catalog.get, mal_ids) if anime)
 
-        for anime in tqdm(anime_list, desc="Anime metadata", ncols=80):
-            mal_id = anime['mal_id']
+    def build_staging_lists(self, mal_ids=None):
+        print("\nBuilding staging lists...")
 
-            # ----------- Anime row -------------
-            self.anime_rows.append((
-                mal_id,
-                anime['title'],
-                anime.get('title_english'),
-                anime.get('title_japanese'),
-                anime.get('title_synonyms', []),
-                anime.get('type'),
-                anime.get('source'),
-                anime.get('episodes'),
-                anime.get('status'),
-                anime.get('aired'),
-                anime.get('duration'),
-                anime.get('rating'),
-                anime.get('score'),
-                anime.get('popularity'),
-                anime.get('season'),
-                anime.get('year'),
-                anime.get('synopsis', ''),
-                anime.get('image_url'),
-                anime.get('trailer_url')
-            ))
+        if mal_ids is None:
+            anime_list = self.fetcher.load_anime_json()
+        else:
+            anime_list = list(self.iter_anime(mal_ids))
+
+        with tqdm(total=len(anime_list), desc="Anime metadata", ncols=80) as pbar:
+            self.stage_many(anime_list, pbar)
 
-            # ----------- Studios ---------------
-            for studio in anime.get('studios', []):
-                self.studio_rows.append((studio['mal_id'], studio['name']))
-                self.anime_studios.append((mal_id, studio['mal_id']))
-
-            # ----------- Genres ----------------
-            for genre in anime.get('genres', []):
-                self.genre_rows.append((genre['mal_id'], genre['name']))
-                self.anime_genres.append((mal_id, genre['mal_id']))
-
-            # ----------- Themes ----------------
-            for theme in anime.get('themes', []):
-                self.theme_rows.append((theme['mal_id'], theme['name']))
-                self.anime_themes.append((mal_id, theme['mal_id']))
-
-            # ----------- Demographics ----------
-            for d in anime.get('demographics', []):
-                self.demographic_rows.append((d['mal_id'], d['name']))
-                self.anime_demographics.append((mal_id, d['mal_id']))
-
-            # ----------- Characters ---------------
-            character_list = self.fetcher.load_characters_json(mal_id)
-            for entry in character_list:
-                char = entry['character']
-
-                # character main table
-                self.character_rows.append((
-                    char['mal_id'],
-                    char['name'],
-                    char['images']['webp']['image_url'] if char.get('images', {}).get('webp', {}).get('image_url', {}) else char['images']['jpg']['image_url'],
-                    entry.get('favorites')
-                ))
-
-                # anime ↔ character (role lives here)
-                self.anime_characters.append((
-                    mal_id,
-                    char['mal_id'],
-                    entry.get('role')
-                ))
-
-                # voice actor table
-                vas = [
-                    va for va in entry['voice_actors']
-                    if va['language'] == 'Japanese'
-                ]
-                for va in vas:
-                    person = va['person']
-
-                    self.voice_actor_rows.append((
-                        person['mal_id'],
-                        person['name'],
-                        person['images']['jpg']['image_url'],
-                        'Japanese'
-                    ))
-
-                    # anime-character-voiceactor junction
-                    self.anime_characters_voice_actors.append((
-                        mal_id,
-                        char['mal_id'],
-                        person['mal_id']
-                    ))
-
-        self.character_rows = self.dedupe_rows(self.character_rows, key_index=0)
-        self.voice_actor_rows = self.dedupe_rows(self.voice_actor_rows, key_index=0)
+        for name, rows in self.dedupe_staging_lists(vars(self)).items():
+            setattr(self, name, rows)
 
         print("✅ Building staging lists completed.")
 
+    @staticmethod
+    def content_hash(anime, character_list):
+        """SHA-256 of everything loaded for one anime (metadata and characters)"""
+        payload = json.dumps([anime, character_list], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def load_manifest(self):
+        """Read the content hashes of the anime already in the database"""
+        self.db.ensure_manifest()
+        self.db.ensure_change_tracking()
+        if self.skip_unchanged:
+            self.manifest = self.db.get_manifest_hashes()
+            print(f"Found {len(self.manifest)} anime in the load manifest")
+
+    def stage_anime(self, anime):
+        """
+        Append the rows of one anime (and its characters) to the staging lists.
+        Returns False (and stages nothing) if its content hash matches the manifest.
+        """
+        mal_id = anime['mal_id']
+        character_list = self.fetcher.load_characters_json(mal_id)
+
+        if not stage_if_changed(self, anime, character_list, self.manifest):
+            self.skipped += 1
+            return False
+        self.changed_ids.append(mal_id)
+        return True
+
+    def merge_staged(self, rows, changed_ids, skipped):
+        """Append the staging lists returned by a staging worker"""
+        for name, staged in rows.items():
+            getattr(self, name).extend(staged)
+        self.changed_ids.extend(changed_ids)
+        self.skipped += skipped
+
+    def stage_many(self, anime_list, pbar=None):
+        """
+        Stage a list of anime, in this process or (with `stage_workers` > 1) on a
+        process pool in chunks of `stage_chunk_size` anime. Workers read and flatten
+        the character lists and send back compact row batches, merged in order.
+        """
+        if self.stage_workers <= 1:
+            for anime in anime_list:
+                self.stage_anime(anime)
+                if pbar is not None:
+                    pbar.update(1)
+            return
+
+        if self._stage_pool is None:
+            self._stage_pool = ProcessPoolExecutor(
+                max_workers=self.stage_workers,
+                initializer=_init_stage_worker,
+                initargs=(str(self.fetcher.data_dir),)
+            )
+
+        tasks = []
+        for i in range(0, len(anime_list), self.stage_chunk_size):
+            chunk = anime_list[i:i + self.stage_chunk_size]
+            known_hashes = {a['mal_id']: self.manifest[a['mal_id']] for a in chunk if a['mal_id'] in self.manifest}
+            tasks.append((chunk, known_hashes))
+
+        for (chunk, _), result in zip(tasks, self._stage_pool.map(_stage_chunk, tasks)):
+            self.merge_staged(*result)
+            if pbar is not None:
+                pbar.update(len(chunk))
+
+    def close(self):
+        if self._stage_pool is not None:
+            self._stage_pool.shutdown()
+            self._stage_pool = None
+
+    def take_staging_lists(self):
+        """Hand over the staged rows (deduped) and start empty lists"""
+        staging = {name: getattr(self, name) for name in self.STAGING_LISTS}
+        staging.update(self.dedupe_staging_lists(staging))
+        self.reset_staging_lists()
+        return staging
+
+    def insert_rows(self, name, rows, anime_ids=()):
+        """Write one staging list to its table (`anime_ids`: the anime staged with it, for sync mode)"""
+        if self.sync_links and name in self.SYNCED_LISTS:
+            if anime_ids:
+                added, removed = self.db.sync_junction(self.STAGING_TABLES[name], rows, anime_ids)
+                changes = self.link_changes.setdefault(name, [0, 0])
+                changes[0] += added
+                changes[1] += removed
+            return
+        if not rows:
+            return
+        if self.use_copy:
+            self.db.bulk_copy(self.STAGING_TABLES[name], rows)
+            return
+
+        inserts = {
+            'anime_rows': self.db.bulk_insert_anime,
+            'studio_rows': self.db.bulk_insert_studios,
+            'anime_studios': self.db.bulk_link_anime_studios,
+            'genre_rows': partial(self.db.bulk_insert_categories, 'genres'),
+            'anime_genres': partial(self.db.bulk_link_anime_categories, 'anime_genres'),
+            'theme_rows': partial(self.db.bulk_insert_categories, 'themes'),
+            'anime_themes': partial(self.db.bulk_link_anime_categories, 'anime_themes'),
+            'demographic_rows': partial(self.db.bulk_insert_categories, 'demographics'),
+            'anime_demographics': partial(self.db.bulk_link_anime_categories, 'anime_demographics'),
+            'character_rows': self.db.bulk_insert_characters,
+            'anime_characters': self.db.bulk_link_anime_characters,
+            'voice_actor_rows': self.db.bulk_insert_voice_actors,
+            'anime_characters_voice_actors': self.db.bulk_link_anime_characters_voice_actors,
+            'manifest_rows': self.db.bulk_upsert_manifest,
+        }
+        inserts[name](rows)
+
+    def insert_staging(self, staging, pbar=None):
+        """
+        Write staged rows table by table in STAGING_LISTS (dependency) order, or as a
+        DAG when `parallel` > 1. Returns {list name: (start, end)} in seconds.
+        """
+        if self.parallel > 1 and not self.atomic:
+            return self.insert_staging_parallel(staging, pbar)
+
+        timings = {}
+        origin = time.perf_counter()
+        anime_ids = [row[0] for row in staging['anime_rows']]
+        for name in self.STAGING_LISTS:
+            start = time.perf_counter() - origin
+            self.insert_rows(name, staging[name], anime_ids)
+            timings[name] = (start, time.perf_counter() - origin)
+            if pbar is not None:
+                pbar.update(1)
+        return timings
+
+    def insert_staging_parallel(self, staging, pbar=None):
+        """
+        Load independent tables concurrently on `parallel` connections; each junction
+        table starts as soon as all of its parent tables are done
+        """
+        timings = {}
+        origin = time.perf_counter()
+        anime_ids = [row[0] for row in staging['anime_rows']]
+
+        def load(name):
+            start = time.perf_counter() - origin
+            self.insert_rows(name, staging[name], anime_ids)
+            return start, time.perf_counter() - origin
+
+        with ThreadPoolExecutor(max_workers=self.parallel, thread_name_prefix="loader") as executor:
+            running = {}
+
+            def submit_ready():
+                for name in self.STAGING_LISTS:
+                    if name in timings or name in running.values():
+                        continue
+                    if all(dep in timings for dep in self.STAGING_DEPENDENCIES.get(name, ())):
+                        running[executor.submit(load, name)] = name
+
+            submit_ready()
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    timings[name] = future.result()  # a failed table stops the load
+                    if pbar is not None:
+                        pbar.update(1)
+                submit_ready()
+
+        return timings
+
+    def unit_of_work(self):
+        """One Database session for the whole load in atomic mode, else one transaction per table"""
+        if self.atomic:
+            return self.db.session(synchronous_commit=self.synchronous_commit)
+        return nullcontext()
+
+    @contextmanager
+    def deferred_indexes(self):
+        """With defer_indexes: no secondary index maintenance while loading, one parallel rebuild after"""
+        if not self.defer_indexes:
+            yield
+            return
+
+        print("\nDropping secondary indexes for the bulk load...")
+        self.db.drop_secondary_indexes()
+        try:
+            yield
+        finally:
+            # Rebuilt even after a failed load, so the tables are never left without indexes
+            print(f"Rebuilding secondary indexes ({self.index_workers} at a time)...")
+            start = time.perf_counter()
+            self.db.rebuild_secondary_indexes(self.index_workers, self.maintenance_work_mem)
+            print(f"✅ Indexes rebuilt and tables analyzed in {time.perf_counter() - start:.1f}s")
+
+    def critical_path(self, timings):
+        """Chain of tables that determined the load time: each one waited on its last-finishing parent"""
+        name = max(timings, key=lambda n: timings[n][1])
+        path = [name]
+        while self.STAGING_DEPENDENCIES.get(name):
+            name = max(self.STAGING_DEPENDENCIES[name], key=lambda n: timings[n][1])
+            path.append(name)
+        return path[::-1]
+
+    def print_timings(self, staging, timings):
+        print("\nPer-table timings (start → end):")
+        for name in sorted(timings, key=lambda n: timings[n]):
+            start, end = timings[name]
+            print(f"  {name:32} {len(staging[name]):>8} rows {start:7.2f}s → {end:7.2f}s ({end - start:6.2f}s)")
+        if self.parallel <= 1 or self.atomic:
+            return  # serial: every table is on the critical path
+        path = self.critical_path(timings)
+        print(f"Critical path ({timings[path[-1]][1]:.2f}s): " + " → ".join(
+            f"{name} ({timings[name][1] - timings[name][0]:.2f}s)" for name in path
+        ))
+
     def bulk_insert(self):
         print("\nBulk inserting into database...")
 
-        with tqdm(total=12, desc="Inserting To Each Table") as pbar:
-            self.db.bulk_insert_anime(self.anime_rows)
-            pbar.update(1)
-
-            self.db.bulk_insert_studios(self.studio_rows)
-            pbar.update(1)
-            self.db.bulk_link_anime_studios(self.anime_studios)
-            pbar.update(1)
-
-            self.db.bulk_insert_categories('genres', self.genre_rows)
-            pbar.update(1)
-            self.db.bulk_link_anime_categories('anime_genres', self.anime_genres)
-            pbar.update(1)
-
-            self.db.bulk_insert_categories('themes', self.theme_rows)
-            pbar.update(1)
-            self.db.bulk_link_anime_categories('anime_themes', self.anime_themes)
-            pbar.update(1)
-
-            self.db.bulk_insert_categories('demographics', self.demographic_rows)
-            pbar.update(1)
-            self.db.bulk_link_anime_categories('anime_demographics', self.anime_demographics)
-            pbar.update(1)
-
-            self.db.bulk_insert_characters(self.character_rows)
-            pbar.update(1)
-            self.db.bulk_link_anime_characters(self.anime_characters)
-            pbar.update(1)
-            self.db.bulk_insert_voice_actors(self.voice_actor_rows)
-            pbar.update(1)
-            self.db.bulk_link_anime_characters_voice_actors(self.anime_characters_voice_actors)
-            pbar.update(1)
+        staging = {name: getattr(self, name) for name in self.STAGING_LISTS}
+        with tqdm(total=len(self.STAGING_LISTS), desc="Inserting To Each Table") as pbar, self.unit_of_work():
+            timings = self.insert_staging(staging, pbar)
 
+        self.print_timings(staging, timings)
         print("✅ Bulk insert completed.")
 
+    def run_streaming(self, mal_ids=None, chunk_size=500, queue_size=2):
+        """
+        Bounded-memory load: stage `chunk_size` anime at a time and hand each chunk to
+        a writer thread through a queue of at most `queue_size` chunks, so parsing the
+        next chunk overlaps with writing the previous one.
+        """
+        print(f"\nStreaming anime into the database in chunks of {chunk_size}...")
+
+        chunks = queue.Queue(maxsize=queue_size)
+        errors = []
+
+        def writer():
+            try:
+                with self.unit_of_work():
+                    while True:
+                        staging = chunks.get()
+                        if staging is None:
+                            break
+                        if errors:
+                            continue  # keep draining so the producer never blocks
+                        try:
+                            self.insert_staging(staging)
+                        except Exception as e:
+                            errors.append(e)
+                    if errors:
+                        raise errors[0]  # atomic mode: roll the whole load back
+            except Exception as e:
+                if not errors:
+                    errors.append(e)  # failed commit
+
+        thread = threading.Thread(target=writer, name="loader-writer", daemon=True)
+        thread.start()
+
+        anime_iter = self.iter_anime(mal_ids)
+        total = len(self.fetcher.catalog) if mal_ids is None else len(mal_ids)
+        try:
+            with tqdm(total=total, desc="Anime", ncols=80) as pbar:
+                while not errors:
+                    chunk = list(islice(anime_iter, chunk_size))
+                    if not chunk:
+                        break
+                    self.stage_many(chunk)
+                    chunks.put(self.take_staging_lists())
+                    pbar.update(len(chunk))
+        finally:
+            chunks.put(None)
+            thread.join()
+
+        if errors:
+            raise errors[0]
+        print("✅ Streaming load completed.")
+
+    def dedupe_staging_lists(self, staging):
+        """Deduped characters / voice actors (last one wins) and int junction lists (vectorized)"""
+        deduped = {
+            'character_rows': self.dedupe_rows(staging['character_rows'], key_index=0),
+            'voice_actor_rows': self.dedupe_rows(staging['voice_actor_rows'], key_index=0),
+        }
+        for name in self.INT_COLUMN_LISTS:
+            deduped[name] = staging[name].unique()
+        return deduped
+
     def dedupe_rows(self, rows, key_index=0):
         seen = {}
         for r in rows:
             seen[r[key_index]] = r   # last one wins
         return list(seen.values())
 
-    def run(self):
-        self.build_staging_lists()
-        # print(self.character_rows[:400])
-        self.bulk_insert()
+    def run(self, mal_ids=None, stream=False, chunk_size=500):
+        self.load_manifest()
+        try:
+            if stream:
+                with self.deferred_indexes():
+                    self.run_streaming(mal_ids, chunk_size=chunk_size)
+            else:
+                self.build_staging_lists(mal_ids)
+                # print(self.character_rows[:400])
+                with self.deferred_indexes():
+                    self.bulk_insert()
+        finally:
+            self.close()
+
+        pool = self.db.pool_stats()
+        print(f"   DB pool: {pool['connections_created']} connections opened (size {pool['max_size']}), "
+              f"{pool['waits']} of {pool['checkouts']} checkouts waited (max {pool['max_wait_seconds']:.2f}s), "
+              f"{pool['timeouts']} timeouts")
+
+        if self.sync_links:
+            for name, (added, removed) in self.link_changes.items():
+                print(f"   {self.STAGING_TABLES[name]}: +{added} / -{removed} links")
+
+        if self.skip_unchanged:
+            delta_path = write_delta_file(self.fetcher.data_dir / "deltas", self.changed_ids, source="load")
+            print(f"✅ Loaded {len(self.changed_ids)} new or changed anime, skipped {self.skipped} unchanged")
+            print(f"   Changed ids written to {delta_path} (python -m scripts.index_anime --delta {delta_path})")
+
+
+def stage_rows(staging, anime, character_list):
+    """Append the rows of one anime and its characters to the staging lists of `staging`"""
+    mal_id = anime['mal_id']
+
+    # ----------- Anime row -------------
+    staging.anime_rows.append((
+        mal_id,
+        anime['title'],
+        anime.get('title_english'),
+        anime.get('title_japanese'),
+        anime.get('title_synonyms', []),
+        anime.get('type'),
+        anime.get('source'),
+        anime.get('episodes'),
+        anime.get('status'),
+        anime.get('aired'),
+        anime.get('duration'),
+        anime.get('rating'),
+        anime.get('score'),
+        anime.get('popularity'),
+        anime.get('season'),
+        anime.get('year'),
+        anime.get('synopsis', ''),
+        anime.get('image_url'),
+        anime.get('trailer_url')
+    ))
+
+    # ----------- Studios ---------------
+    for studio in anime.get('studios', []):
+        staging.studio_rows.append((studio['mal_id'], studio['name']))
+        staging.anime_studios.append((mal_id, studio['mal_id']))
+
+    # ----------- Genres ----------------
+    for genre in anime.get('genres', []):
+        staging.genre_rows.append((genre['mal_id'], genre['name']))
+        staging.anime_genres.append((mal_id, genre['mal_id']))
+
+    # ----------- Themes ----------------
+    for theme in anime.get('themes', []):
+        staging.theme_rows.append((theme['mal_id'], theme['name']))
+        staging.anime_themes.append((mal_id, theme['mal_id']))
+
+    # ----------- Demographics ----------
+    for d in anime.get('demographics', []):
+        staging.demographic_rows.append((d['mal_id'], d['name']))
+        staging.anime_demographics.append((mal_id, d['mal_id']))
+
+    # ----------- Characters ---------------
+    for entry in character_list:
+        char = entry['character']
+
+        # character main table
+        staging.character_rows.append((
+            char['mal_id'],
+            char['name'],
+            char['images']['webp']['image_url'] if char.get('images', {}).get('webp', {}).get('image_url', {}) else char['images']['jpg']['image_url'],
+            entry.get('favorites')
+        ))
+
+        # anime ↔ character (role lives here)
+        staging.anime_characters.append((
+            mal_id,
+            char['mal_id'],
+            entry.get('role')
+        ))
+
+        # voice actor table
+        vas = [
+            va for va in entry['voice_actors']
+            if va['language'] == 'Japanese'
+        ]
+        for va in vas:
+            person = va['person']
+
+            staging.voice_actor_rows.append((
+                person['mal_id'],
+                person['name'],
+                person['images']['jpg']['image_url'],
+                'Japanese'
+            ))
+
+            # anime-character-voiceactor junction
+            staging.anime_characters_voice_actors.append((
+                mal_id,
+                char['mal_id'],
+                person['mal_id']
+            ))
+
+
+
+def new_staging_list(name):
+    """Empty staging list: int32 columns for int-only junction lists, a plain list otherwise"""
+    if name in AnimeLoader.INT_COLUMN_LISTS:
+        return IntColumns(AnimeLoader.INT_COLUMN_LISTS[name])
+    return []
+
+
+def stage_if_changed(staging, anime, character_list, known_hashes):
+    """Stage one anime and its manifest row unless its content hash is in `known_hashes`"""
+    content_hash = AnimeLoader.content_hash(anime, character_list)
+    if known_hashes.get(anime['mal_id']) == content_hash:
+        return False
+    staging.manifest_rows.append((anime['mal_id'], content_hash))
+    stage_rows(staging, anime, character_list)
+    return True
+
+
+# ========== STAGING WORKERS ==========
+# Worker processes open the character store read-only and return plain row lists,
+# which the parent merges in submission order (so "last one wins" still holds).
+
+_worker = {}
+
+
+def _init_stage_worker(data_dir):
+    data_dir = Path(data_dir)
+    _worker['character_store'] = CharacterStore(data_dir / "characters_packed", read_only=True)
+    _worker['characters_dir'] = data_dir / "characters"
+
+
+def _stage_chunk(task):
+    """Stage a chunk of anime: ({list name: rows}, changed mal_ids, skipped count)"""
+    chunk, known_hashes = task
+    staging = SimpleNamespace(**{name: new_staging_list(name) for name in AnimeLoader.STAGING_LISTS})
+    changed_ids = []
+    skipped = 0
+
+    for anime in chunk:
+        mal_id = anime['mal_id']
+        character_list = load_characters(_worker['character_store'], _worker['characters_dir'], mal_id)
+        if stage_if_changed(staging, anime, character_list, known_hashes):
+            changed_ids.append(mal_id)
+        else:
+            skipped += 1
+
+    return vars(staging), changed_ids, skipped
 
 
 if __name__ == "__main__":
-    loader = AnimeLoader()
-    loader.run()
+    import argparse
+    parser = argparse.ArgumentParser(description="Anime Data Loader")
+    parser.add_argument('--delta', default=None,
+                        help='Delta file of changed MAL IDs (data/deltas/changed_*.json); load only those anime')
+    parser.add_argument('--stream', action='store_true',
+                        help='Load in chunks with bounded memory, writing while the next chunk is parsed')
+    parser.add_argument('--chunk-size', dest='chunk_size', type=int, default=500,
+                        help='Anime per chunk in --stream mode (default: 500)')
+    parser.add_argument('--copy', dest='use_copy', action='store_true',
+                        help='Load with COPY into temporary staging tables and set-based merges')
+    parser.add_argument('--parallel', type=int, default=1,
+                        help='Load independent tables concurrently on N connections (default: 1)')
+    parser.add_argument('--atomic', action='store_true',
+                        help='Whole load in one transaction on one connection (all or nothing, tables loaded serially)')
+    parser.add_argument('--async-commit', dest='async_commit', action='store_true',
+                        help='With --atomic: SET LOCAL synchronous_commit = off for the load transaction')
+    parser.add_argument('--skip-unchanged', dest='skip_unchanged', action='store_true',
+                        help='Only load anime whose content hash differs from anime_manifest, write a delta file')
+    parser.add_argument('--sync-links', dest='sync_links', action='store_true',
+                        help='Diff junction tables per loaded anime: add new links, delete links dropped upstream')
+    parser.add_argument('--stage-workers', dest='stage_workers', type=int, default=1,
+                        help='Processes parsing character lists while staging (default: 1 = in process)')
+    parser.add_argument('--stage-chunk-size', dest='stage_chunk_size', type=int, default=100,
+                        help='Anime per staging task with --stage-workers (default: 100)')
+    parser.add_argument('--defer-indexes', dest='defer_indexes', action='store_true',
+                        help='Full loads: drop secondary indexes and the updated_at trigger, rebuild in parallel after')
+    parser.add_argument('--index-workers', dest='index_workers', type=int, default=4,
+                        help='Indexes rebuilt concurrently with --defer-indexes (default: 4)')
+    parser.add_argument('--maintenance-work-mem', dest='maintenance_work_mem', default="512MB",
+                        help='maintenance_work_mem of each index build with --defer-indexes (default: 512MB)')
+    args = parser.parse_args()
+
+    loader = AnimeLoader(
+        use_copy=args.use_copy,
+        parallel=args.parallel,
+        atomic=args.atomic,
+        synchronous_commit=not args.async_commit,
+        skip_unchanged=args.skip_unchanged,
+        sync_links=args.sync_links,
+        stage_workers=args.stage_workers,
+        stage_chunk_size=args.stage_chunk_size,
+        defer_indexes=args.defer_indexes,
+        index_workers=args.index_workers,
+        maintenance_work_mem=args.maintenance_work_mem
+    )
+    loader.run(
+        mal_ids=load_delta_file(args.delta) if args.delta else None,
+        stream=args.stream,
+        chunk_size=args.chunk_size
+    )
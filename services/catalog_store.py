@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+from services.offset_index import OffsetIndex
+
+
+class CatalogStore:
+    """
+    Append-only, line-delimited anime catalog with a mal_id -> offset sidecar index.
+
+    Every record is one compact JSON line in `<name>.jsonl`; `<name>.idx` holds one
+    fixed-size entry per line. Re-appending a mal_id supersedes the earlier line,
+    so appends, existence checks and lookups cost O(change), never O(catalog).
+    Offsets of lines written by a refresh are logged in `<name>.refreshed`, so an
+    intended supersession can be told apart from an accidental duplicate.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._index = OffsetIndex(self.path.with_suffix(".idx"))
+        self._offsets = self._index.offsets  # mal_id -> (offset, length) of the latest record
+        self._refreshed_path = self.path.with_suffix(".refreshed")
+        self._lock = threading.Lock()
+        self._load_index()
+
+    # ========== INDEX ==========
+
+    def _load_index(self):
+        """Read the sidecar index and reconcile it with the data file after a crash"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+
+        data_size = self.path.stat().st_size
+        indexed_end = self._index.load(data_size)
+        if indexed_end < data_size:
+            self._reindex_tail(indexed_end)
+
+    def _reindex_tail(self, start):
+        """Index records appended after the last index entry (crash between the two writes)"""
+        entries = []
+        with open(self.path, "r+b") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Torn final write: drop the partial line
+                    f.truncate(offset)
+                    break
+                record = json.loads(line)
+                entries.append((record["mal_id"], offset, len(line)))
+                offset += len(line)
+
+        self._index.append(entries)
+
+    # ========== WRITE ==========
+
+    def append(self, records, refresh=False):
+        """Append records (dicts with a mal_id); a repeated mal_id replaces the old record"""
+        if not records:
+            return 0
+
+        with self._lock:
+            lines = [
+                (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+                for record in records
+            ]
+            entries = []
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                for record, line in zip(records, lines):
+                    entries.append((record["mal_id"], offset, len(line)))
+                    offset += len(line)
+                f.write(b"".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Data first, index second: a crash in between is repaired on the next open
+            self._index.append(entries)
+            if refresh:
+                with open(self._refreshed_path, "a", encoding="utf-8") as f:
+                    f.write("".join(f"{offset}\n" for _, offset, _ in entries))
+        return len(entries)
+
+    def reset(self):
+        """Drop every record"""
+        with self._lock:
+            with open(self.path, "wb"):
+                pass
+            self._index.reset()
+            self._refreshed_path.unlink(missing_ok=True)
+
+    # ========== READ ==========
+
+    def __contains__(self, mal_id):
+        return mal_id in self._offsets
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def ids(self):
+        """Set of every mal_id in the catalog"""
+        return set(self._offsets)
+
+    def get(self, mal_id):
+        """Random lookup of the latest record for `mal_id`"""
+        location = self._offsets.get(mal_id)
+        if location is None:
+            return None
+        offset, length = location
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def __iter__(self):
+        """Sequential scan of the latest version of every record, in append order"""
+        live = {offset for offset, _ in self._offsets.values()}
+        for offset, record in self.scan():
+            if offset in live:
+                yield record
+
+    def refreshed_offsets(self):
+        """Offsets of the lines appended by a refresh"""
+        if not self._refreshed_path.exists():
+            return set()
+        with open(self._refreshed_path, "r", encoding="utf-8") as f:
+            return {int(line) for line in f if line.strip()}
+
+    def scan(self):
+        """Yield (offset, record) for every line, superseded ones included"""
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                if line.endswith(b"\n"):
+                    yield offset, json.loads(line)
+                offset += len(line)
+
+
+def migrate_json_catalog(json_path, store):
+    """One-shot conversion of the legacy anime_data.json array into a CatalogStore"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        anime_list = json.load(f)
+
+    store.reset()
+    store.append(anime_list)
+    return len(anime_list)
@@ -0,0 +1,247 @@
+import json
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+
+from services.offset_index import OffsetIndex
+
+# Record header inside a segment: anime mal_id, compressed payload length
+RECORD_HEADER = struct.Struct("<iI")
+DEFAULT_SHARDS = int(os.getenv("CHARACTER_STORE_SHARDS", 4))
+
+
+def slim_characters(characters_data):
+    """Keep only the character fields AnimeLoader reads (Japanese voice actors only)"""
+    slim = []
+    for entry in characters_data or []:
+        char = entry['character']
+        images = char.get('images', {})
+        slim.append({
+            'character': {
+                'mal_id': char['mal_id'],
+                'name': char['name'],
+                'images': {
+                    'jpg': {'image_url': images.get('jpg', {}).get('image_url')},
+                    'webp': {'image_url': images.get('webp', {}).get('image_url')},
+                },
+            },
+            'role': entry.get('role'),
+            'favorites': entry.get('favorites'),
+            'voice_actors': [
+                {
+                    'person': {
+                        'mal_id': va['person']['mal_id'],
+                        'name': va['person']['name'],
+                        'images': {'jpg': {'image_url': va['person']['images']['jpg']['image_url']}},
+                    },
+                    'language': va['language'],
+                }
+                for va in entry.get('voice_actors', [])
+                if va.get('language', '').lower().strip() == 'japanese'
+            ],
+        })
+    return slim
+
+
+class CharacterShard:
+    """
+    One segment file of zlib-compressed character lists plus its offset index.
+    A read-only shard never repairs the files; it serves what is fully indexed.
+    """
+
+    def __init__(self, path, read_only=False):
+        self.path = Path(path)
+        self.index = OffsetIndex(self.path.with_suffix(".idx"))
+        if not read_only:
+            self.path.touch(exist_ok=True)
+
+        data_size = self.path.stat().st_size
+        indexed_end = self.index.load(data_size, read_only=read_only)
+        if indexed_end < data_size and not read_only:
+            self._reindex_tail(indexed_end, data_size)
+
+        # Read-only descriptor for positional reads (os.pread is safe across threads)
+        self._fd = os.open(self.path, os.O_RDONLY)
+
+    def __del__(self):
+        fd = getattr(self, "_fd", None)
+        if fd is not None:
+            os.close(fd)
+
+    def _reindex_tail(self, start, data_size):
+        """Index records written after the last index entry, dropping a torn final record"""
+        entries = []
+        with open(self.path, "r+b") as f:
+            offset = start
+            while offset + RECORD_HEADER.size <= data_size:
+                f.seek(offset)
+                mal_id, length = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                end = offset + RECORD_HEADER.size + length
+                if end > data_size:
+                    break
+                entries.append((mal_id, offset, end - offset))
+                offset = end
+            f.truncate(offset)
+        self.index.append(entries)
+
+    def append(self, records):
+        """Append [(mal_id, compressed_payload)] records"""
+        entries = []
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            chunks = []
+            for mal_id, payload in records:
+                chunks.append(RECORD_HEADER.pack(mal_id, len(payload)))
+                chunks.append(payload)
+                entries.append((mal_id, offset, RECORD_HEADER.size + len(payload)))
+                offset += RECORD_HEADER.size + len(payload)
+            f.write(b"".join(chunks))
+            f.flush()
+            os.fsync(f.fileno())
+        self.index.append(entries)
+
+    def reset(self):
+        with open(self.path, "wb"):
+            pass
+        self.index.reset()
+
+    def read(self, mal_id):
+        location = self.index.offsets.get(mal_id)
+        if location is None:
+            return None
+        offset, length = location
+        payload = os.pread(self._fd, length - RECORD_HEADER.size, offset + RECORD_HEADER.size)
+        return json.loads(zlib.decompress(payload))
+
+    def scan(self):
+        """Yield (mal_id, characters) for the live records, in file order"""
+        live = {offset for offset, _ in self.index.offsets.values()}
+        offset = 0
+        with open(self.path, "rb", buffering=1024 * 1024) as f:
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                mal_id, length = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if offset in live:
+                    yield mal_id, json.loads(zlib.decompress(payload))
+                offset += RECORD_HEADER.size + length
+
+
+class CharacterStore:
+    """
+    Packed, compressed store of per-anime character lists.
+
+    Records are spread over `shards` segment files by anime mal_id; each segment
+    has an OffsetIndex for O(1) random access, and a full scan reads each
+    segment sequentially. Writing a mal_id again supersedes the older record.
+    """
+
+    def __init__(self, root, shards=None, read_only=False):
+        self.root = Path(root)
+        self.read_only = read_only  # e.g. loader worker processes: never writes or repairs
+        if not read_only:
+            self.root.mkdir(parents=True, exist_ok=True)
+        self.shard_count = self._load_manifest(shards or DEFAULT_SHARDS)
+        self.shards = [
+            CharacterShard(self.root / f"shard-{n:02d}.seg", read_only=read_only)
+            for n in range(self.shard_count)
+        ]
+        self._lock = threading.Lock()
+
+    def _load_manifest(self, shards):
+        """The shard count is fixed when the store is created"""
+        manifest = self.root / "manifest.json"
+        if manifest.exists():
+            return json.loads(manifest.read_text())["shards"]
+        if self.read_only:
+            return 0  # no store yet: empty
+        manifest.write_text(json.dumps({"shards": shards, "compression": "zlib"}))
+        return shards
+
+    def _shard(self, mal_id):
+        return self.shards[mal_id % self.shard_count] if self.shards else None
+
+    @staticmethod
+    def encode(characters_data):
+        payload = json.dumps(slim_characters(characters_data), ensure_ascii=False, separators=(",", ":"))
+        return zlib.compress(payload.encode("utf-8"), 6)
+
+    # ========== WRITE ==========
+
+    def put(self, mal_id, characters_data):
+        """Store the character list for one anime"""
+        self.put_many([(mal_id, characters_data)])
+
+    def put_many(self, items):
+        """Store [(mal_id, characters_data)] in one write per shard"""
+        by_shard = {}
+        for mal_id, characters_data in items:
+            by_shard.setdefault(mal_id % self.shard_count, []).append((mal_id, self.encode(characters_data)))
+
+        with self._lock:
+            for shard_no, records in by_shard.items():
+                self.shards[shard_no].append(records)
+
+    def reset(self):
+        """Drop every record"""
+        with self._lock:
+            for shard in self.shards:
+                shard.reset()
+
+    # ========== READ ==========
+
+    def __contains__(self, mal_id):
+        return bool(self.shards) and mal_id in self._shard(mal_id).index.offsets
+
+    def __len__(self):
+        return sum(len(shard.index.offsets) for shard in self.shards)
+
+    def ids(self):
+        """Set of every anime mal_id with stored characters"""
+        return {mal_id for shard in self.shards for mal_id in shard.index.offsets}
+
+    def get(self, mal_id):
+        """Random lookup of the character list for one anime"""
+        return self._shard(mal_id).read(mal_id) if self.shards else None
+
+    def __iter__(self):
+        """Sequential scan yielding (mal_id, characters) for every anime"""
+        for shard in self.shards:
+            yield from shard.scan()
+
+    def disk_usage(self):
+        """Bytes used by the segments, indexes and manifest"""
+        return sum(p.stat().st_size for p in self.root.iterdir() if p.is_file())
+
+
+def load_characters(store, characters_dir, mal_id):
+    """Character list of one anime from the packed store, falling back to a loose JSON file"""
+    characters_data = store.get(mal_id)
+    if characters_data is not None:
+        return characters_data
+
+    filename = Path(characters_dir) / f"{mal_id}_characters.json"
+    if filename.exists():
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return None
+
+
+def pack_character_files(characters_dir, store):
+    """One-shot conversion of loose {mal_id}_characters.json files into a CharacterStore"""
+    batch = []
+    count = 0
+    for path in Path(characters_dir).glob("*_characters.json"):
+        mal_id = int(path.stem.replace("_characters", ""))
+        with open(path, "r", encoding="utf-8") as f:
+            batch.append((mal_id, json.load(f)))
+        if len(batch) >= 500:
+            store.put_many(batch)
+            count += len(batch)
+            batch = []
+    store.put_many(batch)
+    return count + len(batch)
@@ -0,0 +1,182 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of database connections.
+
+    At most `max_size` connections are open; a checkout waits on a Condition for
+    one to be returned and raises TimeoutError after `timeout` seconds. Idle
+    connections are reused last-in first-out, closed once older than
+    `max_lifetime`, and pinged (`SELECT 1`) before reuse when idle longer than
+    `health_check_after`, so a dropped connection is replaced instead of handed out.
+    """
+
+    def __init__(self, connect, max_size=10, timeout=30.0, max_lifetime=1800.0, health_check_after=30.0):
+        self.connect = connect  # () -> new connection
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+
+        self._idle = []  # [(conn, created_at, returned_at)], most recently returned last
+        self._created_at = {}  # id(conn) -> creation time, for every open connection
+        self._size = 0  # open connections, idle or checked out
+        self._waiters = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "health_check_failures": 0,
+        }
+
+    # ========== CHECKOUT / RETURN ==========
+
+    def getconn(self):
+        """Check out a healthy connection (opening one if the pool is not full)"""
+        while True:
+            conn, created_at, returned_at = self._checkout()
+            if conn is None:
+                return self._open()
+            if time.monotonic() - created_at > self.max_lifetime:
+                self._discard(conn)
+                continue
+            if time.monotonic() - returned_at > self.health_check_after and not self._healthy(conn):
+                with self._cond:
+                    self._stats["health_check_failures"] += 1
+                self._discard(conn)
+                continue
+            return conn
+
+    def _checkout(self):
+        """Reserve an idle connection, or a slot for a new one ((None, None, None)); waits when full"""
+        with self._cond:
+            start = time.monotonic()
+            deadline = start + self.timeout
+            waited = False
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise TimeoutError(
+                        f"No database connection available after {self.timeout:g}s "
+                        f"({self._size} in use, pool size {self.max_size})"
+                    )
+                waited = True
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+            self._stats["checkouts"] += 1
+            if waited:
+                wait = time.monotonic() - start
+                self._stats["waits"] += 1
+                self._stats["wait_seconds"] += wait
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], wait)
+
+            if self._idle:
+                return self._idle.pop()
+            self._size += 1
+            return None, None, None
+
+    def _open(self):
+        try:
+            conn = self.connect()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created_at[id(conn)] = time.monotonic()
+            self._stats["connections_created"] += 1
+        return conn
+
+    @staticmethod
+    def _healthy(conn):
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def putconn(self, conn):
+        """Return a checked-out connection; an open transaction is rolled back, a broken connection closed"""
+        if not conn.closed and conn.get_transaction_status() not in (TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN):
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+
+        if conn.closed or conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            created_at = self._created_at.get(id(conn), time.monotonic())
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        """Close a reserved connection and free its slot"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._created_at.pop(id(conn), None)
+            self._size -= 1
+            self._stats["connections_closed"] += 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def clear(self):
+        """Close every idle connection (e.g. after the connection parameters changed)"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._stats["connections_closed"] += len(idle)
+            for conn, _, _ in idle:
+                self._created_at.pop(id(conn), None)
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    # ========== METRICS ==========
+
+    def stats(self):
+        """Current pool state and cumulative checkout counters"""
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "open": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiters": self._waiters,
+                **self._stats,
+            }
@@ -1,8 +1,16 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.extensions import cursor as TupleCursor
+from psycopg2.extras import NamedTupleCursor, RealDictCursor, execute_values
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+import io
+import itertools
 import os
+import re
+import threading
+from pathlib import Path
 from dotenv import load_dotenv
+from services.connection_pool import ConnectionPool
 
 load_dotenv()
 
@@ -12,13 +20,115 @@ CATEGORY_COLUMN_MAP = {
     "anime_demographics": "demographic_id",
 }
 
+ANIME_COLUMNS = (
+    "mal_id", "title", "title_english", "title_japanese", "title_synonyms", "type",
+    "source", "episodes", "status", "aired_string", "duration", "rating",
+    "score", "popularity", "season", "year", "synopsis", "image_url", "trailer_url",
+)
+
+# Every non-key anime column is updated on conflict: the load manifest hashes the whole
+# record, so any changed field must reach the row
+ANIME_UPDATE_COLUMNS = ANIME_COLUMNS[1:]
+
+# COPY load targets: table -> (columns, conflict key, columns updated on conflict or None for DO NOTHING)
+COPY_TABLES = {
+    "anime": (ANIME_COLUMNS, ("mal_id",), ANIME_UPDATE_COLUMNS),
+    "studios": (("mal_id", "name"), ("mal_id",), None),
+    "genres": (("mal_id", "name"), ("mal_id",), None),
+    "themes": (("mal_id", "name"), ("mal_id",), None),
+    "demographics": (("mal_id", "name"), ("mal_id",), None),
+    "characters": (("mal_id", "name", "image_url", "favorites"), ("mal_id",),
+                   ("name", "image_url", "favorites")),
+    "voice_actors": (("mal_id", "name", "image_url", "language"), ("mal_id",),
+                     ("name", "image_url")),
+    "anime_studios": (("anime_id", "studio_id"), ("anime_id", "studio_id"), None),
+    **{
+        junction: (("anime_id", column), ("anime_id", column), None)
+        for junction, column in CATEGORY_COLUMN_MAP.items()
+    },
+    "anime_characters": (("anime_id", "character_id", "role"), ("anime_id", "character_id"), ("role",)),
+    "anime_character_voice_actors": (("anime_id", "character_id", "voice_actor_id"),
+                                     ("anime_id", "character_id", "voice_actor_id"), None),
+    "anime_manifest": (("mal_id", "content_hash"), ("mal_id",), ("content_hash",)),
+}
+
+# Timestamp column set on every row a COPY merge actually updates
+COPY_TOUCH_COLUMNS = {
+    "anime": "updated_at",
+    "anime_manifest": "loaded_at",
+}
+
+# Row types of Database.stream_query
+ROW_FACTORIES = {
+    "dict": RealDictCursor,
+    "tuple": TupleCursor,
+    "namedtuple": NamedTupleCursor,
+}
+
+# Schema of a fresh database; the ensure_* methods run its sections on older databases
+INIT_SCRIPT = Path(__file__).resolve().parent.parent / "init-scripts" / "01-init.sql"
+
+# Secondary indexes of init-scripts/01-init.sql: name -> "table (columns)"
+# (dropped and rebuilt around a bulk load, see AnimeLoader --defer-indexes)
+SECONDARY_INDEXES = {
+    "idx_anime_studios_anime_id": "anime_studios (anime_id)",
+    "idx_anime_studios_studio_id": "anime_studios (studio_id)",
+    "idx_anime_genres_anime_id": "anime_genres (anime_id)",
+    "idx_anime_genres_genre_id": "anime_genres (genre_id)",
+    "idx_anime_themes_anime_id": "anime_themes (anime_id)",
+    "idx_anime_themes_theme_id": "anime_themes (theme_id)",
+    "idx_anime_demographics_anime_id": "anime_demographics (anime_id)",
+    "idx_anime_demographics_demographic_id": "anime_demographics (demographic_id)",
+    "idx_anime_characters_anime_id": "anime_characters (anime_id)",
+    "idx_characters_favorites_desc": "characters (favorites DESC)",
+    "idx_acva_anime_id": "anime_character_voice_actors (anime_id)",
+    "idx_acva_character_id": "anime_character_voice_actors (character_id)",
+    "idx_acva_voice_actor_id": "anime_character_voice_actors (voice_actor_id)",
+    "idx_anime_score": "anime (score DESC)",
+    "idx_anime_popularity": "anime (popularity)",
+    "idx_anime_type": "anime (type)",
+    "idx_anime_season_year": "anime (year, season)",
+    "idx_anime_updated_at": "anime (updated_at)",
+    "idx_anime_changes_changed_at": "anime_changes (changed_at)",
+}
+
+def init_script_section(name):
+    """SQL of one `-- ========== NAME ==========` section of the init script (up to the next one)"""
+    sections = re.split(r"^-- ========== (.+?) ==========$", INIT_SCRIPT.read_text(encoding="utf-8"), flags=re.M)
+    for title, sql in zip(sections[1::2], sections[2::2]):
+        if title == name:
+            return sql
+    raise KeyError(f"No section {name!r} in {INIT_SCRIPT}")
+
+
+def _copy_value(value):
+    """Format one value for COPY ... FROM STDIN in text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (list, tuple)):
+        value = "{" + ",".join(
+            "NULL" if v is None else '"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"'
+            for v in value
+        ) + "}"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def copy_buffer(rows):
+    """Rows (tuples, or a columnar buffer with copy_text()) as a COPY text-format file object"""
+    if hasattr(rows, "copy_text"):
+        return io.StringIO(rows.copy_text())
+    return io.StringIO("".join("\t".join(map(_copy_value, row)) + "\n" for row in rows))
+
 
 class Database:
     """
     Ways to execute SQL query
     """
 
-    def __init__(self):
+    def __init__(self, pool_size=None):
         self.conn_params = {
             "host": os.getenv("DB_HOST", "postgres"),
             "port": os.getenv("DB_PORT", "5432"),
@@ -26,29 +136,131 @@ class Database:
             "user": os.getenv("DB_USER", "anime_user"),
             "password": os.getenv("DB_PASSWORD", "anime_password")
         }
+        # Connections are reused across queries and threads (one Database is shared by every Streamlit session)
+        self.pool = ConnectionPool(
+            self._connect,
+            max_size=pool_size or int(os.getenv("DB_POOL_SIZE", 10)),
+            timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+            max_lifetime=float(os.getenv("DB_POOL_MAX_LIFETIME", 1800)),
+        )
+        self._local = threading.local()  # connection of the active session, per thread
+        self._cursor_ids = itertools.count(1)  # unique names for server-side cursors
         self.test_connection()
 
+    def _connect(self):
+        return psycopg2.connect(**self.conn_params, cursor_factory=RealDictCursor)
+
     def test_connection(self):
-        """Test database connection"""
+        """Test database connection (and keep it in the pool)"""
         try:
-            conn = psycopg2.connect(**self.conn_params)
+            with self.pool.connection():
+                pass
             print("✅ PostgreSQL connection successful!")
-            conn.close()
         except Exception as e:
             print(f"❌ PostgreSQL connection failed: {e}")
 
+    def pool_stats(self):
+        """Connections open / idle / in use, waiters and checkout wait times of the pool"""
+        return self.pool.stats()
+
     @contextmanager
     def get_connection(self):
-        """Get database connection"""
-        conn = psycopg2.connect(**self.conn_params, cursor_factory=RealDictCursor)
+        """Get a pooled database connection (inside a session: the session's connection, committed by the session)"""
+        session_conn = getattr(self._local, "conn", None)
+        if session_conn is not None:
+            yield session_conn
+            return
+
+        with self.pool.connection() as conn:
+            try:
+                yield conn
+                conn.commit()
+            except:
+                conn.rollback()
+                raise
+
+    # ========== UNIT OF WORK ==========
+
+    @contextmanager
+    def session(self, synchronous_commit=True):
+        """
+        Unit of work: every query made by this thread inside the block (including the
+        bulk_* methods) runs on one connection in one transaction, committed when the
+        block ends and rolled back entirely if it raises. Nested sessions join the
+        outer one.
+
+        :param synchronous_commit: False sets `SET LOCAL synchronous_commit = off`, so the
+               commit does not wait for the WAL flush (a crash right after it can lose
+               the load, but never leaves it half-applied)
+        """
+        if getattr(self._local, "conn", None) is not None:
+            yield self._local.conn
+            return
+
+        with self.pool.connection() as conn:
+            self._local.conn = conn
+            try:
+                if not synchronous_commit:
+                    with conn.cursor() as cur:
+                        cur.execute("SET LOCAL synchronous_commit = off")
+                yield conn
+                conn.commit()
+            except:
+                conn.rollback()
+                raise
+            finally:
+                self._local.conn = None
+
+    @contextmanager
+    def savepoint(self, name):
+        """Named savepoint inside a session: if the block raises, only its work is rolled back"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            raise RuntimeError("savepoint() needs an active session()")
+
+        with conn.cursor() as cur:
+            cur.execute(f"SAVEPOINT {name}")
         try:
             yield conn
-            conn.commit()
         except:
-            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute(f"ROLLBACK TO SAVEPOINT {name}")
             raise
-        finally:
-            conn.close()
+        with conn.cursor() as cur:
+            cur.execute(f"RELEASE SAVEPOINT {name}")
+
+    # ========== BULK LOAD INDEXES ==========
+
+    def drop_secondary_indexes(self):
+        """Drop every SECONDARY_INDEXES index and disable the anime updated_at trigger"""
+        statements = [f"DROP INDEX IF EXISTS {name}" for name in SECONDARY_INDEXES]
+        statements.append("ALTER TABLE anime DISABLE TRIGGER update_anime_updated_at")
+        self.execute_query(";\n".join(statements))
+
+    def create_secondary_index(self, name, maintenance_work_mem="512MB", parallel_workers=2):
+        """Build one SECONDARY_INDEXES index (a parallel sort with its own maintenance_work_mem)"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL maintenance_work_mem = %s", (maintenance_work_mem,))
+                cur.execute("SET LOCAL max_parallel_maintenance_workers = %s", (parallel_workers,))
+                cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {SECONDARY_INDEXES[name]}")
+
+    def rebuild_secondary_indexes(self, workers=4, maintenance_work_mem="512MB", parallel_workers=2):
+        """
+        Recreate every SECONDARY_INDEXES index, `workers` at a time on separate
+        connections, re-enable the updated_at trigger and ANALYZE the loaded tables.
+        Each build can use up to `maintenance_work_mem` (times `workers` in total).
+        """
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            builds = [
+                pool.submit(self.create_secondary_index, name, maintenance_work_mem, parallel_workers)
+                for name in SECONDARY_INDEXES
+            ]
+            for build in builds:
+                build.result()
+
+        self.execute_query("ALTER TABLE anime ENABLE TRIGGER update_anime_updated_at")
+        self.execute_query(f"ANALYZE {', '.join(COPY_TABLES)}")
 
     def execute_query(self, query, params=None):
         """Execute a query and return results"""
@@ -61,6 +273,129 @@ class Database:
                     return cur.fetchall()
                 return cur.rowcount
 
+    def stream_query(self, query, params=None, itersize=2000, row_factory="dict", batches=False):
+        """
+        Yield the rows of a query lazily from a named (server-side) cursor, fetching
+        `itersize` rows per round trip, so a large result is never held in memory.
+
+        The pooled connection stays checked out until the generator is exhausted or
+        closed. Inside a session() the cursor runs in the session's transaction.
+
+        :param row_factory: "dict" (RealDictRow), "tuple" or "namedtuple"
+        :param batches: yield lists of up to `itersize` rows instead of single rows
+        """
+        with self.get_connection() as conn:
+            name = f"stream_{next(self._cursor_ids)}"
+            with conn.cursor(name, cursor_factory=ROW_FACTORIES[row_factory]) as cur:
+                cur.itersize = itersize
+                cur.execute(query, params or ())
+                if not batches:
+                    yield from cur
+                    return
+                while True:
+                    rows = cur.fetchmany(itersize)
+                    if not rows:
+                        break
+                    yield rows
+
+    # ========== COPY LOAD ==========
+
+    @staticmethod
+    def _copy_to_stage(cur, table, stage, rows):
+        """
+        COPY rows into a fresh temp table shaped like `table` (plus a _seq column in arrival order).
+        Column defaults are not copied: the merge only reads the COPY columns, so defaults such as
+        created_at are applied by the target table on insert, not computed for every staged row.
+        """
+        columns = COPY_TABLES[table][0]
+        cur.execute(f"""
+        DROP TABLE IF EXISTS {stage};
+        CREATE TEMP TABLE {stage} (LIKE {table}) ON COMMIT DROP;
+        ALTER TABLE {stage} ADD COLUMN _seq BIGSERIAL;
+        """)
+        cur.copy_expert(f"COPY {stage} ({', '.join(columns)}) FROM STDIN", copy_buffer(rows))
+
+    @staticmethod
+    def _merge_sql(table, stage):
+        """Set-based INSERT ... SELECT ... ON CONFLICT from a stage table, with the COPY_TABLES rules"""
+        columns, key, update_columns = COPY_TABLES[table]
+        column_list = ", ".join(columns)
+        key_list = ", ".join(key)
+
+        if update_columns is None:
+            # Anti-join: only rows not in the table yet are sent to the insert
+            match = " AND ".join(f"t.{c} = s.{c}" for c in key)
+            return f"""
+            INSERT INTO {table} ({column_list})
+            SELECT {", ".join(f"s.{c}" for c in columns)} FROM {stage} s
+            WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE {match})
+            ON CONFLICT ({key_list}) DO NOTHING
+            """
+
+        # DO UPDATE cannot touch a row twice in one statement: keep the last copy of each key
+        on_conflict = "DO UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in update_columns)
+        if table in COPY_TOUCH_COLUMNS:
+            on_conflict += f", {COPY_TOUCH_COLUMNS[table]} = CURRENT_TIMESTAMP"
+        # Rows whose values did not change are left alone (no dead tuple, no WAL, no trigger)
+        on_conflict += " WHERE ({}) IS DISTINCT FROM ({})".format(
+            ", ".join(f"{table}.{c}" for c in update_columns),
+            ", ".join(f"EXCLUDED.{c}" for c in update_columns)
+        )
+        return f"""
+        INSERT INTO {table} ({column_list})
+        SELECT DISTINCT ON ({key_list}) {column_list} FROM {stage} ORDER BY {key_list}, _seq DESC
+        ON CONFLICT ({key_list}) {on_conflict}
+        """
+
+    def bulk_copy(self, table, rows):
+        """
+        Load MANY rows into `table` with COPY instead of execute_values.
+
+        Rows are streamed with COPY FROM STDIN into a temporary (unlogged, session
+        local) staging table, then merged into the target with one set-based
+        INSERT ... SELECT ... ON CONFLICT using the same conflict rules as the
+        bulk_* methods. If a key appears twice, the last row wins.
+
+        :param table: a key of COPY_TABLES
+        :param rows: list of tuples in COPY_TABLES column order
+        """
+        stage = f"stage_{table}"
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                self._copy_to_stage(cur, table, stage, rows)
+                cur.execute(self._merge_sql(table, stage))
+                return cur.rowcount
+
+    def sync_junction(self, table, rows, anime_ids):
+        """
+        Make the links of `anime_ids` in a junction table exactly `rows`.
+
+        The new links are COPY'd into a staging table, then links of those anime
+        missing from the stage are deleted (anti-join) and staged links missing
+        from the table are inserted (or have their role updated), so only the
+        actual difference is written.
+
+        :param table: an anime_* junction table of COPY_TABLES
+        :param rows: list of tuples in COPY_TABLES column order
+        :param anime_ids: every anime being synced, including anime that now have no links
+        :return: (rows added or updated, rows removed)
+        """
+        key = COPY_TABLES[table][1]
+        stage = f"sync_{table}"
+        match = " AND ".join(f"s.{c} = t.{c}" for c in key)
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                self._copy_to_stage(cur, table, stage, rows)
+                cur.execute(f"""
+                DELETE FROM {table} t
+                WHERE t.anime_id = ANY(%s)
+                  AND NOT EXISTS (SELECT 1 FROM {stage} s WHERE {match})
+                """, (list(anime_ids),))
+                removed = cur.rowcount
+                cur.execute(self._merge_sql(table, stage))
+                return cur.rowcount, removed
+
     # ========== ANIME METHODS ==========
 
     def insert_anime(self, anime_data):
@@ -129,20 +464,17 @@ class Database:
         """
 
         query = """
-        INSERT INTO anime (
-            mal_id, title, title_english, title_japanese, title_synonyms, type,
-            source, episodes, status, aired_string, duration, rating,
-            score, popularity, season, year, synopsis, image_url, trailer_url
-        ) VALUES %s
+        INSERT INTO anime ({columns}) VALUES %s
         ON CONFLICT (mal_id) DO UPDATE SET
-            title = EXCLUDED.title,
-            title_english = EXCLUDED.title_english,
-            score = EXCLUDED.score,
-            popularity = EXCLUDED.popularity,
-            synopsis = EXCLUDED.synopsis,
-            image_url = EXCLUDED.image_url,
+            {updates},
             updated_at = CURRENT_TIMESTAMP
-        """
+        WHERE ({current}) IS DISTINCT FROM ({excluded})
+        """.format(
+            columns=", ".join(ANIME_COLUMNS),
+            updates=",\n            ".join(f"{c} = EXCLUDED.{c}" for c in ANIME_UPDATE_COLUMNS),
+            current=", ".join(f"anime.{c}" for c in ANIME_UPDATE_COLUMNS),
+            excluded=", ".join(f"EXCLUDED.{c}" for c in ANIME_UPDATE_COLUMNS),
+        )
 
         with self.get_connection() as conn:
             with conn.cursor() as cur:
@@ -285,6 +617,8 @@ class Database:
             name = EXCLUDED.name,
             image_url = EXCLUDED.image_url,
             favorites = EXCLUDED.favorites
+        WHERE (characters.name, characters.image_url, characters.favorites)
+            IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.image_url, EXCLUDED.favorites)
         """
 
         with self.get_connection() as conn:
@@ -304,6 +638,7 @@ class Database:
         VALUES %s
         ON CONFLICT (anime_id, character_id)
         DO UPDATE SET role = EXCLUDED.role
+        WHERE anime_characters.role IS DISTINCT FROM EXCLUDED.role
         """
 
         with self.get_connection() as conn:
@@ -346,6 +681,8 @@ class Database:
         ON CONFLICT (mal_id) DO UPDATE SET
             name = EXCLUDED.name,
             image_url = EXCLUDED.image_url
+        WHERE (voice_actors.name, voice_actors.image_url)
+            IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.image_url)
         """
 
         with self.get_connection() as conn:
@@ -370,3 +707,91 @@ class Database:
         with self.get_connection() as conn:
             with conn.cursor() as cur:
                 execute_values(cur, query, rows)
+
+    # ========== SCHEMA ==========
+
+    def execute_init_section(self, name):
+        """Run one section of the init script as is (no parameters, so no %-interpolation)"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(init_script_section(name))
+
+    # ========== LOAD MANIFEST ==========
+
+    def ensure_manifest(self):
+        """Create anime_manifest on databases initialised before it existed"""
+        self.execute_init_section("LOAD MANIFEST")
+
+    def ensure_document_functions(self):
+        """Create (or update) the SQL functions used to build anime documents in Postgres"""
+        self.execute_init_section("DOCUMENT FUNCTIONS")
+
+    # ========== CHANGE TRACKING ==========
+
+    def ensure_change_tracking(self):
+        """Create the change log, watermark table and their triggers on databases initialised before them"""
+        self.execute_init_section("CHANGE TRACKING")
+
+    def change_mark(self):
+        """
+        Timestamp before which every change is committed: now(), or the start of the
+        oldest transaction still running here (its rows carry that earlier timestamp)
+        """
+        result = self.execute_query("""
+        SELECT LEAST(now(), (
+            SELECT min(xact_start) FROM pg_stat_activity
+            WHERE datname = current_database() AND xact_start IS NOT NULL AND pid <> pg_backend_pid()
+        ))::timestamp AS mark
+        """)
+        return result[0]['mark']
+
+    def get_watermark(self, name):
+        result = self.execute_query("SELECT high_water_mark FROM index_watermarks WHERE name = %s", (name,))
+        return result[0]['high_water_mark'] if result else None
+
+    def set_watermark(self, name, mark):
+        self.execute_query("""
+        INSERT INTO index_watermarks (name, high_water_mark) VALUES (%s, %s)
+        ON CONFLICT (name) DO UPDATE SET high_water_mark = EXCLUDED.high_water_mark, updated_at = CURRENT_TIMESTAMP
+        """, (name, mark))
+
+    def changed_anime_ids(self, since):
+        """Anime whose row, characters, voice actors or links changed at or after `since`"""
+        result = self.execute_query("""
+        SELECT mal_id FROM anime WHERE updated_at >= %s
+        UNION
+        SELECT anime_id FROM anime_changes WHERE changed_at >= %s
+        """, (since, since))
+        return sorted(row['mal_id'] for row in result)
+
+    def prune_changes(self, watermarks):
+        """Keep only the `watermarks` names, and the change log from the oldest of them on"""
+        self.execute_query("DELETE FROM index_watermarks WHERE name <> ALL(%s)", (list(watermarks),))
+        return self.execute_query("""
+        DELETE FROM anime_changes
+        WHERE changed_at < (SELECT min(high_water_mark) FROM index_watermarks)
+        """)
+
+    def get_manifest_hashes(self):
+        """{mal_id: content hash} of every anime loaded so far"""
+        rows = self.execute_query("SELECT mal_id, content_hash FROM anime_manifest")
+        return {row['mal_id']: row['content_hash'] for row in rows}
+
+    def bulk_upsert_manifest(self, manifest_rows):
+        """
+        manifest_rows:
+        (mal_id, content_hash)
+        """
+
+        query = """
+        INSERT INTO anime_manifest (mal_id, content_hash)
+        VALUES %s
+        ON CONFLICT (mal_id) DO UPDATE SET
+            content_hash = EXCLUDED.content_hash,
+            loaded_at = CURRENT_TIMESTAMP
+        WHERE anime_manifest.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+        """
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, query, manifest_rows)
@@ -1,8 +1,13 @@
 from elasticsearch import Elasticsearch, helpers
 from elasticsearch.exceptions import NotFoundError
 from utils.helpers import extract_year_month_season
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
 import os
+import queue
 import re
+import threading
 from dotenv import load_dotenv
 from tqdm import tqdm
 import logging
@@ -14,6 +19,227 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 
+# Relationship CTEs of one keyset window of anime documents: `batch_anime` is the next
+# batch of anime after a mal_id (params: last mal_id, [mal_ids filter], batch size), and
+# every aggregation only reads the rows of that window.
+ANIME_RELATIONS_CTE = """
+WITH batch_anime AS (
+    SELECT a.*
+    FROM anime a
+    WHERE a.mal_id > %s {anime_filter}
+    ORDER BY a.mal_id
+    LIMIT %s
+),
+ranked_characters AS (
+    SELECT
+        ac.anime_id,
+        c.mal_id AS character_mal_id,
+        c.name AS character_name,
+        c.image_url AS character_image_url,
+        c.favorites,
+        ac.role,
+        ROW_NUMBER() OVER (
+            PARTITION BY ac.anime_id
+            ORDER BY c.favorites DESC NULLS LAST
+        ) AS rn
+    FROM anime_characters ac
+    JOIN characters c ON ac.character_id = c.mal_id
+    WHERE ac.anime_id IN (SELECT mal_id FROM batch_anime)
+),
+top_characters AS (
+    SELECT *
+    FROM ranked_characters
+    WHERE rn <= 10
+),
+character_voice_actors AS (
+    SELECT
+        acva.anime_id,
+        acva.character_id,
+        json_agg(
+            DISTINCT jsonb_build_object(
+                'mal_id', va.mal_id,
+                'name', va.name,
+                'image_url', va.image_url
+            )
+        ) AS voice_actors
+    FROM anime_character_voice_actors acva
+    JOIN voice_actors va ON acva.voice_actor_id = va.mal_id
+    WHERE va.language = 'Japanese'
+      AND acva.anime_id IN (SELECT mal_id FROM batch_anime)
+    GROUP BY acva.anime_id, acva.character_id
+),
+anime_studios_agg AS (
+    SELECT
+        ast.anime_id,
+        json_agg(DISTINCT jsonb_build_object(
+            'mal_id', s.mal_id,
+            'name', s.name
+        )) AS studios,
+        json_agg(s.name) AS names
+    FROM anime_studios ast
+    JOIN studios s ON ast.studio_id = s.mal_id
+    WHERE ast.anime_id IN (SELECT mal_id FROM batch_anime)
+    GROUP BY ast.anime_id
+),
+anime_genres_agg AS (
+    SELECT
+        ag.anime_id,
+        json_agg(DISTINCT jsonb_build_object(
+            'mal_id', g.mal_id,
+            'name', g.name
+        )) AS genres,
+        json_agg(g.name) AS names
+    FROM anime_genres ag
+    JOIN genres g ON ag.genre_id = g.mal_id
+    WHERE ag.anime_id IN (SELECT mal_id FROM batch_anime)
+    GROUP BY ag.anime_id
+),
+anime_themes_agg AS (
+    SELECT
+        at2.anime_id,
+        json_agg(DISTINCT jsonb_build_object(
+            'mal_id', t.mal_id,
+            'name', t.name
+        )) AS themes,
+        json_agg(t.name) AS names
+    FROM anime_themes at2
+    JOIN themes t ON at2.theme_id = t.mal_id
+    WHERE at2.anime_id IN (SELECT mal_id FROM batch_anime)
+    GROUP BY at2.anime_id
+),
+anime_demographics_agg AS (
+    SELECT
+        ad.anime_id,
+        json_agg(DISTINCT jsonb_build_object(
+            'mal_id', d.mal_id,
+            'name', d.name
+        )) AS demographics,
+        json_agg(d.name) AS names
+    FROM anime_demographics ad
+    JOIN demographics d ON ad.demographic_id = d.mal_id
+    WHERE ad.anime_id IN (SELECT mal_id FROM batch_anime)
+    GROUP BY ad.anime_id
+),
+sorted_top_characters AS (
+    SELECT
+        tc.anime_id,
+        tc.character_mal_id,
+        tc.character_name,
+        tc.character_image_url,
+        tc.favorites,
+        tc.role,
+        tc.rn,
+        COALESCE(cva.voice_actors, '[]'::json) AS voice_actors
+    FROM top_characters tc
+    LEFT JOIN character_voice_actors cva
+        ON tc.anime_id = cva.anime_id
+        AND tc.character_mal_id = cva.character_id
+    ORDER BY tc.favorites DESC NULLS LAST
+),
+anime_characters_agg AS (
+    SELECT
+        anime_id,
+        json_agg(
+            jsonb_build_object(
+                'mal_id', character_mal_id,
+                'name', character_name,
+                'role', role,
+                'favorites', favorites,
+                'image_url', character_image_url,
+                'voice_actors', voice_actors
+            )
+            ORDER BY rn
+        ) AS characters,
+        array_agg(character_name ORDER BY rn) FILTER (WHERE rn <= 5) AS top_names
+    FROM sorted_top_characters
+    GROUP BY anime_id
+)
+"""
+
+# Anime rows with their relationship JSON, built into documents by ElasticsearchService.anime_action
+ANIME_DOCUMENT_SELECT = """
+SELECT
+    a.*,
+    COALESCE(asa.studios, '[]'::json) AS studios,
+    COALESCE(aga.genres, '[]'::json) AS genres,
+    COALESCE(ata.themes, '[]'::json) AS themes,
+    COALESCE(ada.demographics, '[]'::json) AS demographics,
+    COALESCE(aca.characters, '[]'::json) AS characters
+FROM batch_anime a
+LEFT JOIN anime_studios_agg asa ON a.mal_id = asa.anime_id
+LEFT JOIN anime_genres_agg aga ON a.mal_id = aga.anime_id
+LEFT JOIN anime_themes_agg ata ON a.mal_id = ata.anime_id
+LEFT JOIN anime_demographics_agg ada ON a.mal_id = ada.anime_id
+LEFT JOIN anime_characters_agg aca ON a.mal_id = aca.anime_id
+ORDER BY a.mal_id
+"""
+
+# Complete `_source` of each anime document of a keyset window, serialized by Postgres
+# (same fields as ElasticsearchService.anime_action; the derived ones come from the
+# functions of init-scripts/01-init.sql)
+ANIME_SOURCE_SELECT = """
+SELECT
+    a.mal_id,
+    json_build_object(
+        'mal_id', a.mal_id,
+        'title', a.title,
+        'title_english', a.title_english,
+        'title_japanese', a.title_japanese,
+        'title_synonyms', a.title_synonyms,
+        'search_full_names', search_full_names(a.title, a.title_english, a.title_synonyms),
+        'search_key_names', search_key_names(a.title, a.title_english, a.title_synonyms, aca.top_names),
+        'synopsis', a.synopsis,
+        'type', a.type,
+        'source', a.source,
+        'status', a.status,
+        'score', a.score,
+        'popularity', a.popularity,
+        'episodes', a.episodes,
+        'duration', a.duration,
+        'duration_minutes', duration_minutes(a.duration),
+        'rating', a.rating,
+        'season', COALESCE(NULLIF(a.season, ''), aired.season),
+        'year', COALESCE(NULLIF(a.year, 0), aired.year),
+        'aired_string', a.aired_string,
+        'image_url', a.image_url,
+        'trailer_url', a.trailer_url,
+        'studios', COALESCE(asa.studios, '[]'::json),
+        'genres', COALESCE(aga.genres, '[]'::json),
+        'themes', COALESCE(ata.themes, '[]'::json),
+        'demographics', COALESCE(ada.demographics, '[]'::json),
+        'characters', COALESCE(aca.characters, '[]'::json),
+        'studio_names', COALESCE(asa.names, '[]'::json),
+        'genre_names', COALESCE(aga.names, '[]'::json),
+        'theme_names', COALESCE(ata.names, '[]'::json),
+        'demographic_names', COALESCE(ada.names, '[]'::json),
+        'is_popular', COALESCE(a.popularity <> 0 AND a.popularity <= 1000, false),
+        'score_range', CASE
+            WHEN a.score IS NULL OR a.score = 0 THEN 'unknown'
+            WHEN a.score >= 9.0 THEN '9+'
+            WHEN a.score >= 8.0 THEN '8-9'
+            WHEN a.score >= 7.0 THEN '7-8'
+            WHEN a.score >= 6.0 THEN '6-7'
+            ELSE '0-6'
+        END,
+        'episode_range', CASE
+            WHEN a.episodes IS NULL OR a.episodes = 0 THEN 'unknown'
+            WHEN a.episodes = 1 THEN 'movie'
+            WHEN a.episodes <= 12 THEN 'short'
+            WHEN a.episodes <= 24 THEN 'medium'
+            ELSE 'long'
+        END
+    )::text AS source
+FROM batch_anime a
+CROSS JOIN LATERAL aired_start(a.aired_string) aired
+LEFT JOIN anime_studios_agg asa ON a.mal_id = asa.anime_id
+LEFT JOIN anime_genres_agg aga ON a.mal_id = aga.anime_id
+LEFT JOIN anime_themes_agg ata ON a.mal_id = ata.anime_id
+LEFT JOIN anime_demographics_agg ada ON a.mal_id = ada.anime_id
+LEFT JOIN anime_characters_agg aca ON a.mal_id = aca.anime_id
+ORDER BY a.mal_id
+"""
+
+
 class ElasticsearchService:
     def __init__(self):
         self.host = os.getenv("ES_HOST", "elasticsearch")
@@ -279,8 +505,12 @@ class ElasticsearchService:
         except Exception as e:
             logger.error(f"❌ Error creating search suggestions index: {e}")
 
-    def index_all_data(self, db_service):
-        """Index all data from database"""
+    def index_all_data(self, db_service, mal_ids=None, sql_documents=False):
+        """
+        Index all data from database (only `mal_ids` if given, e.g. from a delta file)
+
+        :param sql_documents: build the anime documents in Postgres (index_anime_sql_documents)
+        """
         logger.info("Starting comprehensive data indexing...")
 
         # Create all indices
@@ -294,10 +524,15 @@ class ElasticsearchService:
             body={"index": {"refresh_interval": "-1"}}
         )
 
+        start = time.perf_counter()
         # Index anime
-        results['anime'] = self.index_anime_complete(db_service)
+        if sql_documents:
+            results['anime'] = self.index_anime_sql_documents(db_service, mal_ids)
+        else:
+            results['anime'] = self.index_anime_complete(db_service, mal_ids)
         # Index search suggestions
-        results['search_suggestions'] = self.index_search_suggestions(db_service)
+        results['search_suggestions'] = self.index_search_suggestions(db_service, mal_ids)
+        seconds = time.perf_counter() - start
 
         self.es.indices.put_settings(
             index=self.indices['anime'],
@@ -306,318 +541,484 @@ class ElasticsearchService:
 
         # Print summary
         time.sleep(5)
-        self.print_indexing_summary(results)
+        self.print_indexing_summary(results, seconds)
+
+        return results
+
+    # ========== VERSIONED INDICES (BLUE/GREEN) ==========
+    # `self.indices` names are aliases; each full reindex writes a new generation of
+    # physical indices ({alias}-{YYYYmmddHHMMSS}) and repoints the aliases atomically,
+    # so searches keep hitting the previous generation until the new one is complete.
+
+    def reindex(self, db_service, sql_documents=False, keep=3, min_ratio=0.9):
+        """
+        Zero-downtime full reindex: build and validate a new generation of every index,
+        swap the aliases to it in one request, then prune old generations to `keep`.
+        A failed build or validation deletes the new generation and leaves the live one.
+
+        :param min_ratio: reject a generation smaller than this fraction of the live one
+        :return: per-index document counts of the new generation
+        """
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        targets = {key: f"{alias}-{stamp}" for key, alias in self.indices.items()}
+        logger.info(f"Building index generation {stamp}...")
+
+        # Changes from here on are left to the incremental indexer (index_changes)
+        db_service.ensure_change_tracking()
+        mark = db_service.change_mark()
+
+        try:
+            with self.writing_to(targets):
+                results = self.index_all_data(db_service, sql_documents=sql_documents)
+            self.validate_generation(targets, {
+                'anime': self.count_anime(db_service),
+                'search_suggestions': results['search_suggestions'],
+            }, min_ratio)
+        except Exception:
+            logger.error(f"❌ Generation {stamp} failed, the live indices are unchanged")
+            self.delete_generation(targets)
+            raise
+
+        db_service.set_watermark(targets['anime'], mark)
+        self.swap_aliases(targets)
+        print(f"✅ Aliases now point to generation {stamp}")
+        self.prune_generations(keep)
+        return results
+
+    @contextmanager
+    def writing_to(self, indices):
+        """Point index creation and the indexing methods at other (physical) indices"""
+        aliases, self.indices = self.indices, {**self.indices, **indices}
+        try:
+            yield
+        finally:
+            self.indices = aliases
+
+    def validate_generation(self, targets, expected, min_ratio=0.9):
+        """Raise RuntimeError unless every new index holds the expected (and a plausible) number of documents"""
+        for key, index in targets.items():
+            self.es.indices.refresh(index=index)
+            count = self.es.count(index=index)['count']
+            if count == 0 or count != expected[key]:
+                raise RuntimeError(f"{index} has {count} documents, expected {expected[key]}")
+
+            live = self.live_generation(key)
+            live_count = self.es.count(index=live)['count'] if live else 0
+            if count < live_count * min_ratio:
+                raise RuntimeError(f"{index} has {count} documents, live {live} has {live_count} "
+                                   f"(minimum ratio {min_ratio:g})")
+            logger.info(f"✅ {index}: {count} documents (live: {live_count})")
+
+    def swap_aliases(self, targets):
+        """Atomically point each alias at its index in `targets`"""
+        actions = []
+        for key, index in targets.items():
+            alias = self.indices[key]
+            if self.es.indices.exists_alias(name=alias):
+                actions.append({"remove": {"index": f"{alias}-*", "alias": alias}})
+            elif self.es.indices.exists(index=alias):
+                actions.append({"remove_index": {"index": alias}})  # index from before aliases
+            actions.append({"add": {"index": index, "alias": alias}})
+        self.es.indices.update_aliases(actions=actions)
+
+    def generations(self, key):
+        """Generation stamps of an index, oldest first"""
+        alias = self.indices[key]
+        return sorted(name[len(alias) + 1:] for name in self.es.indices.get(index=f"{alias}-*"))
+
+    def live_generation(self, key):
+        """Physical index behind an alias (None before the first swap)"""
+        try:
+            return next(iter(self.es.indices.get_alias(name=self.indices[key])), None)
+        except NotFoundError:
+            return None
+
+    def rollback(self, stamp=None):
+        """Point every alias back to generation `stamp` (default: the one before the live generation)"""
+        live = self.live_generation('anime')
+        if stamp is None:
+            live_stamp = live[len(self.indices['anime']) + 1:] if live else ""
+            previous = [g for g in self.generations('anime') if g < live_stamp]
+            if not previous:
+                raise RuntimeError("No earlier index generation to roll back to")
+            stamp = previous[-1]
+
+        targets = {key: f"{alias}-{stamp}" for key, alias in self.indices.items()}
+        for index in targets.values():
+            if not self.es.indices.exists(index=index):
+                raise RuntimeError(f"Generation {stamp} is incomplete: {index} does not exist")
+
+        self.swap_aliases(targets)
+        print(f"✅ Rolled back to generation {stamp} (was {live})")
+        return stamp
+
+    def prune_generations(self, keep=3):
+        """Delete all but the newest `keep` generations of each index (never a live one)"""
+        for key, alias in self.indices.items():
+            live = self.live_generation(key)
+            generations = self.generations(key)
+            for stamp in generations[:max(len(generations) - keep, 0)]:
+                index = f"{alias}-{stamp}"
+                if index != live:
+                    self.es.indices.delete(index=index)
+                    logger.info(f"Pruned old generation: {index}")
+
+    def delete_generation(self, targets):
+        for index in targets.values():
+            try:
+                self.es.indices.delete(index=index, ignore_unavailable=True)
+            except Exception as e:
+                logger.error(f"Error deleting {index}: {e}")
+
+    # ========== INCREMENTAL INDEXING ==========
+
+    def index_changes(self, db_service, since=None, sql_documents=False):
+        """
+        Upsert only the anime changed since the live generation's high-water mark (or
+        `since`): their own row (updated_at) or their characters, voice actors and links
+        (the anime_changes log). Their suggestions are re-indexed too, then the mark
+        advances. A run with failed documents keeps the old mark, so they are retried.
 
+        :return: per-index document counts
+        """
+        db_service.ensure_change_tracking()
+        watermark = self.live_generation('anime') or self.indices['anime']
+        mark = db_service.change_mark()
+        since = since or db_service.get_watermark(watermark)
+        if since is None:
+            raise RuntimeError(f"No watermark for {watermark}: run a full index first, or pass --since")
+
+        start = time.perf_counter()
+        mal_ids = db_service.changed_anime_ids(since)
+        results = {'anime': 0, 'search_suggestions': 0}
+        if mal_ids:
+            if sql_documents:
+                results['anime'] = self.index_anime_sql_documents(db_service, mal_ids)
+            else:
+                results['anime'] = self.index_anime_complete(db_service, mal_ids)
+            results['search_suggestions'] = self.index_search_suggestions(db_service, mal_ids)
+
+            if results['anime'] < self.count_anime(db_service, mal_ids):
+                logger.warning(f"⚠️ Some changed anime failed indexing, watermark stays at {since}")
+                return results
+
+        db_service.set_watermark(watermark, mark)
+        live = [f"{self.indices['anime']}-{stamp}" for stamp in self.generations('anime')]
+        db_service.prune_changes(live or [watermark])
+        logger.info(f"✅ {len(mal_ids)} changed anime since {since} indexed in "
+                    f"{time.perf_counter() - start:.2f}s, watermark now {mark}")
         return results
 
-    def index_anime_complete(self, db_service):
-        """Index anime with ALL relationship data"""
+    def index_anime_complete(self, db_service, mal_ids=None):
+        """Index anime with ALL relationship data (only `mal_ids` if given)"""
         logger.info("Indexing anime with all relationships...")
 
-        # Get total count
-        count_query = "SELECT COUNT(*) as total FROM anime"
-        result = db_service.execute_query(count_query)
-        total_anime = result[0]['total'] if result else 0
+        batches = (
+            [action for action in map(self.anime_action, rows) if action]
+            for rows in self.anime_keyset_batches(db_service, ANIME_DOCUMENT_SELECT, mal_ids)
+        )
+        indexed, failed = self.bulk_pipeline(batches, total=self.count_anime(db_service, mal_ids),
+                                             desc="Indexing anime")
+        if failed:
+            logger.warning(f"{failed} documents failed indexing")
 
-        indexed = 0
-        batch_size = int(os.getenv("ES_BATCH_SIZE", 500))
-        offset = 0
-
-        with tqdm(total=total_anime, desc="Indexing anime") as pbar:
-            while offset < total_anime:
-                # Complex query to get all relationship data
-                query = """
-                WITH ranked_characters AS (
-                    SELECT
-                        ac.anime_id,
-                        c.mal_id AS character_mal_id,
-                        c.name AS character_name,
-                        c.image_url AS character_image_url,
-                        c.favorites,
-                        ac.role,
-                        ROW_NUMBER() OVER (
-                            PARTITION BY ac.anime_id
-                            ORDER BY c.favorites DESC NULLS LAST
-                        ) AS rn
-                    FROM anime_characters ac
-                    JOIN characters c ON ac.character_id = c.mal_id
-                ),
-                top_characters AS (
-                    SELECT *
-                    FROM ranked_characters
-                    WHERE rn <= 10
-                ),
-                character_voice_actors AS (
-                    SELECT
-                        acva.anime_id,
-                        acva.character_id,
-                        json_agg(
-                            DISTINCT jsonb_build_object(
-                                'mal_id', va.mal_id,
-                                'name', va.name,
-                                'image_url', va.image_url
-                            )
-                        ) AS voice_actors
-                    FROM anime_character_voice_actors acva
-                    JOIN voice_actors va ON acva.voice_actor_id = va.mal_id
-                    WHERE va.language = 'Japanese'
-                    GROUP BY acva.anime_id, acva.character_id
-                ),
-                anime_studios_agg AS (
-                    SELECT
-                        ast.anime_id,
-                        json_agg(DISTINCT jsonb_build_object(
-                            'mal_id', s.mal_id,
-                            'name', s.name
-                        )) AS studios
-                    FROM anime_studios ast
-                    JOIN studios s ON ast.studio_id = s.mal_id
-                    GROUP BY ast.anime_id
-                ),
-                anime_genres_agg AS (
-                    SELECT
-                        ag.anime_id,
-                        json_agg(DISTINCT jsonb_build_object(
-                            'mal_id', g.mal_id,
-                            'name', g.name
-                        )) AS genres
-                    FROM anime_genres ag
-                    JOIN genres g ON ag.genre_id = g.mal_id
-                    GROUP BY ag.anime_id
-                ),
-                anime_themes_agg AS (
-                    SELECT
-                        at2.anime_id,
-                        json_agg(DISTINCT jsonb_build_object(
-                            'mal_id', t.mal_id,
-                            'name', t.name
-                        )) AS themes
-                    FROM anime_themes at2
-                    JOIN themes t ON at2.theme_id = t.mal_id
-                    GROUP BY at2.anime_id
-                ),
-                anime_demographics_agg AS (
-                    SELECT
-                        ad.anime_id,
-                        json_agg(DISTINCT jsonb_build_object(
-                            'mal_id', d.mal_id,
-                            'name', d.name
-                        )) AS demographics
-                    FROM anime_demographics ad
-                    JOIN demographics d ON ad.demographic_id = d.mal_id
-                    GROUP BY ad.anime_id
-                ),
-                sorted_top_characters AS (
-                    SELECT
-                        tc.anime_id,
-                        tc.character_mal_id,
-                        tc.character_name,
-                        tc.character_image_url,
-                        tc.favorites,
-                        tc.role,
-                        COALESCE(cva.voice_actors, '[]'::json) AS voice_actors
-                    FROM top_characters tc
-                    LEFT JOIN character_voice_actors cva
-                        ON tc.anime_id = cva.anime_id
-                        AND tc.character_mal_id = cva.character_id
-                    ORDER BY tc.favorites DESC NULLS LAST
-                ),
-                anime_characters_agg AS (
-                    SELECT
-                        anime_id,
-                        json_agg(
-                            jsonb_build_object(
-                                'mal_id', character_mal_id,
-                                'name', character_name,
-                                'role', role,
-                                'favorites', favorites,
-                                'image_url', character_image_url,
-                                'voice_actors', voice_actors
-                            )
-                        ) AS characters
-                    FROM sorted_top_characters
-                    GROUP BY anime_id
-                )
-                SELECT
-                    a.*,
-                    COALESCE(asa.studios, '[]'::json) AS studios,
-                    COALESCE(aga.genres, '[]'::json) AS genres,
-                    COALESCE(ata.themes, '[]'::json) AS themes,
-                    COALESCE(ada.demographics, '[]'::json) AS demographics,
-                    COALESCE(aca.characters, '[]'::json) AS characters
-                FROM anime a
-                LEFT JOIN anime_studios_agg asa ON a.mal_id = asa.anime_id
-                LEFT JOIN anime_genres_agg aga ON a.mal_id = aga.anime_id
-                LEFT JOIN anime_themes_agg ata ON a.mal_id = ata.anime_id
-                LEFT JOIN anime_demographics_agg ada ON a.mal_id = ada.anime_id
-                LEFT JOIN anime_characters_agg aca ON a.mal_id = aca.anime_id
-                ORDER BY a.mal_id
-                LIMIT %s OFFSET %s
-                """
-
-                results = db_service.execute_query(query, (batch_size, offset))
-
-                if not results:
-                    break
+        logger.info(f"Indexed {indexed} anime with complete relationships")
+        return indexed
 
-                actions = []
-                for anime in results:
-                    # Compute derived fields
-                    is_popular = anime['popularity'] <= 1000 if anime['popularity'] else False
-
-                    score_range = 'unknown'
-                    if anime['score']:
-                        if anime['score'] >= 9.0:
-                            score_range = '9+'
-                        elif anime['score'] >= 8.0:
-                            score_range = '8-9'
-                        elif anime['score'] >= 7.0:
-                            score_range = '7-8'
-                        elif anime['score'] >= 6.0:
-                            score_range = '6-7'
-                        else:
-                            score_range = '0-6'
-
-                    episode_range = 'unknown'
-                    if anime['episodes']:
-                        if anime['episodes'] == 1:
-                            episode_range = 'movie'
-                        elif anime['episodes'] <= 12:
-                            episode_range = 'short'
-                        elif anime['episodes'] <= 24:
-                            episode_range = 'medium'
-                        else:
-                            episode_range = 'long'
-
-                    year = None
-                    season = None
-                    result = extract_year_month_season(anime.get('aired_string'))
-                    if result:
-                        year = int(result[0])
-                        if not isinstance(year, int):
-                            return
-                        season = result[1]
-
-                    # Base input for anime titles
-                    title = anime['title']
-                    title_english = anime.get('title_english') or ''
-                    synonyms = anime.get('title_synonyms', []) or []  # Ensure it's always a list
-
-                    fullnames = [title]
-                    title_tokens = [t for t in re.split(r"[ /]+", title.strip()) if t]
-                    keynames = [title] + title_tokens
-
-                    if title_english:
-                        fullnames.append(title_english)
-                        keynames.append(title_english)
-                        title_english_tokens = [t for t in re.split(r"[ /]+", title_english.strip()) if t]
-                        keynames.extend(title_english_tokens)
-
-                    if synonyms:
-                        fullnames.extend(synonyms)
-                        keynames.extend(synonyms)
-                        for syn in synonyms:
-                            if syn:
-                                title_syn_tokens = [t for t in re.split(r"[ /]+", syn.strip()) if t]
-                                keynames.extend(title_syn_tokens)
-
-                    # Character inputs -> Find anime based on character names
-                    char_inputs = set()  # Use set to avoid duplicates
-                    raw_chars = anime.get('characters', [])[:5]
-                    for char in raw_chars:
-                        full_name = char.get('name', '')
-                        if not full_name:
-                            continue
-                        full_name = full_name.strip()
-                        # Always add the raw/official name
-                        char_inputs.add(full_name)
-                        # Reversal logic for "Last, First" formats (common on MAL)
-                        if ', ' in full_name:
-                            parts = full_name.split(', ', 1)
-                            if len(parts) == 2:
-                                last = parts[0].strip()
-                                first = parts[1].strip()
-                                # Add "First Last" (Western order)
-                                char_inputs.add(f"{first} {last}")
-                                # Add first name only (most common user search!)
-                                char_inputs.add(first)
-                                # Add last name only
-                                char_inputs.add(last)
-
-                    keynames = keynames + list(char_inputs)
-
-                    action = {
-                        "_index": self.indices['anime'],
-                        "_id": anime['mal_id'],
-                        "_source": {
-                            "mal_id": anime['mal_id'],
-                            "title": anime['title'],
-                            "title_english": anime['title_english'],
-                            "title_japanese": anime['title_japanese'],
-                            "title_synonyms": anime.get('title_synonyms', []),
-                            "search_full_names": fullnames,
-                            "search_key_names": keynames,
-                            "synopsis": anime.get('synopsis', ''),
-                            "type": anime.get('type'),
-                            "source": anime.get('source'),
-                            "status": anime.get('status'),
-                            "score": anime.get('score'),
-                            "popularity": anime.get('popularity'),
-                            "episodes": anime.get('episodes', 0),
-                            "duration": anime.get('duration'),
-                            "duration_minutes": extract_minutes_from_duration(anime.get('duration')),
-                            "rating": anime.get('rating'),
-                            "season": anime['season'] if anime.get('season', None) else season,
-                            "year": anime['year'] if anime.get('year', None) else year,
-                            "aired_string": anime.get('aired_string'),
-                            "image_url": anime.get('image_url'),
-                            "trailer_url": anime.get('trailer_url'),
-
-                            # Nested relationships
-                            "studios": anime.get('studios', []),
-                            "genres": anime.get('genres', []),
-                            "themes": anime.get('themes', []),
-                            "demographics": anime.get('demographics', []),
-                            "characters": anime.get('characters', []),
-
-                            # Flat arrays for filtering
-                            "studio_names": [s['name'] for s in anime.get('studios', [])],
-                            "genre_names": [g['name'] for g in anime.get('genres', [])],
-                            "theme_names": [t['name'] for t in anime.get('themes', [])],
-                            "demographic_names": [d['name'] for d in anime.get('demographics', [])],
-                            # "character_names": [c['name'] for c in anime.get('characters', [])],
-                            # "voice_actor_names": list(set(
-                            #     va['name']
-                            #     for c in anime.get('characters', [])
-                            #     for va in c.get('voice_actors', [])
-                            # )),
-
-                            # Computed fields
-                            "is_popular": is_popular,
-                            "score_range": score_range,
-                            "episode_range": episode_range
-                        }
-                    }
-                    actions.append(action)
+    def index_anime_sql_documents(self, db_service, mal_ids=None):
+        """
+        Index anime with documents built entirely by Postgres (only `mal_ids` if given)
 
-                if actions:
-                    success, failed = helpers.bulk(self.es, actions, stats_only=True, raise_on_error=False)
-                    if failed:
-                        logger.warning(f"{failed} documents failed indexing")
-                    indexed += success
+        Same documents as index_anime_complete, but each `_source` arrives as JSON text
+        (ANIME_SOURCE_SELECT) and goes into the bulk body as is: no row dicts, no
+        per-field Python, no re-serialization.
+        """
+        logger.info("Indexing anime documents built by Postgres...")
+        db_service.ensure_document_functions()
 
-                offset += batch_size
-                pbar.update(len(results))
-                # time.sleep(0.1)
+        batches = (
+            [{"_index": self.indices['anime'], "_id": mal_id, "_source": source} for mal_id, source in rows]
+            for rows in self.anime_keyset_batches(db_service, ANIME_SOURCE_SELECT, mal_ids, row_factory="tuple")
+        )
+        indexed, failed = self.bulk_pipeline(batches, total=self.count_anime(db_service, mal_ids),
+                                             desc="Indexing anime (SQL documents)")
+        if failed:
+            logger.warning(f"{failed} documents failed indexing")
 
         logger.info(f"Indexed {indexed} anime with complete relationships")
         return indexed
 
-    def index_search_suggestions(self, db_service):
-        """Index all searchable entities for autocomplete"""
+    def count_anime(self, db_service, mal_ids=None):
+        count_filter = "WHERE a.mal_id = ANY(%s)" if mal_ids is not None else ""
+        filter_params = (list(mal_ids),) if mal_ids is not None else ()
+        result = db_service.execute_query(f"SELECT COUNT(*) as total FROM anime a {count_filter}", filter_params)
+        return result[0]['total'] if result else 0
+
+    def anime_keyset_batches(self, db_service, select, mal_ids=None, row_factory="dict"):
+        """
+        Yield the rows of ANIME_RELATIONS_CTE + `select`, ES_BATCH_SIZE anime at a time
+
+        Keyset pagination: each batch is the next anime after the last mal_id, and every
+        aggregation only reads the rows of that batch, so a full export is one linear pass.
+        `select` returns mal_id first (as a column or key).
+        """
+        anime_filter = "AND a.mal_id = ANY(%s)" if mal_ids is not None else ""
+        filter_params = (list(mal_ids),) if mal_ids is not None else ()
+        query = ANIME_RELATIONS_CTE.format(anime_filter=anime_filter) + select
+        batch_size = int(os.getenv("ES_BATCH_SIZE", 500))
+        last_mal_id = -1
+
+        while True:
+            rows = list(db_service.stream_query(query, (last_mal_id,) + filter_params + (batch_size,),
+                                                row_factory=row_factory))
+            if not rows:
+                return
+            last_mal_id = rows[-1]['mal_id'] if row_factory == "dict" else rows[-1][0]
+            yield rows
+
+    def bulk_pipeline(self, batches, total=None, desc="Indexing"):
+        """
+        Pipelined bulk indexing of an iterable of action lists
+
+        A producer thread pulls the batches (e.g. one SQL query each) into a queue of
+        at most ES_BULK_QUEUE batches, while ES_BULK_THREADS senders (helpers.parallel_bulk)
+        index them concurrently in requests of at most ES_BULK_MAX_BYTES of payload and
+        ES_BATCH_SIZE documents. Reading the next batch from Postgres overlaps with
+        Elasticsearch ingesting the previous ones.
+
+        :return: (succeeded, failed) document counts
+        """
+        threads = int(os.getenv("ES_BULK_THREADS", 4))
+        max_bytes = int(os.getenv("ES_BULK_MAX_BYTES", 10 * 1024 * 1024))
+        chunk_size = int(os.getenv("ES_BATCH_SIZE", 500))
+        pending = queue.Queue(maxsize=int(os.getenv("ES_BULK_QUEUE", 4)))
+        stop = threading.Event()
+        errors = []
+        done = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def producer():
+            try:
+                for batch in batches:
+                    if not put(batch):
+                        return
+            except Exception as e:
+                errors.append(e)
+            put(done)
+
+        def actions():
+            while True:
+                batch = pending.get()
+                if batch is done:
+                    return
+                yield from batch
+
+        succeeded = failed = 0
+        start = time.perf_counter()
+        thread = threading.Thread(target=producer, name="es-bulk-producer", daemon=True)
+        thread.start()
+        try:
+            with tqdm(total=total, desc=desc) as pbar:
+                for ok, item in helpers.parallel_bulk(
+                    self.es, actions(), thread_count=threads, chunk_size=chunk_size,
+                    max_chunk_bytes=max_bytes, queue_size=threads,
+                    raise_on_error=False, raise_on_exception=False,
+                ):
+                    if ok:
+                        succeeded += 1
+                    else:
+                        failed += 1
+                        if failed <= 5:
+                            logger.warning(f"Failed to index document: {item}")
+                    pbar.update(1)
+        finally:
+            stop.set()
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+        seconds = time.perf_counter() - start
+        rate = succeeded / seconds if seconds else 0
+        logger.info(f"{desc}: {succeeded} indexed, {failed} failed in {seconds:.1f}s ({rate:,.0f} docs/s)")
+        return succeeded, failed
+
+    def anime_action(self, anime):
+        """Bulk index action of one anime row (with its relationship JSON) from the export query"""
+        # Compute derived fields
+        is_popular = anime['popularity'] <= 1000 if anime['popularity'] else False
+
+        score_range = 'unknown'
+        if anime['score']:
+            if anime['score'] >= 9.0:
+                score_range = '9+'
+            elif anime['score'] >= 8.0:
+                score_range = '8-9'
+            elif anime['score'] >= 7.0:
+                score_range = '7-8'
+            elif anime['score'] >= 6.0:
+                score_range = '6-7'
+            else:
+                score_range = '0-6'
+
+        episode_range = 'unknown'
+        if anime['episodes']:
+            if anime['episodes'] == 1:
+                episode_range = 'movie'
+            elif anime['episodes'] <= 12:
+                episode_range = 'short'
+            elif anime['episodes'] <= 24:
+                episode_range = 'medium'
+            else:
+                episode_range = 'long'
+
+        year = None
+        season = None
+        result = extract_year_month_season(anime.get('aired_string'))
+        if result:
+            year = int(result[0])
+            if not isinstance(year, int):
+                return
+            season = result[1]
+
+        # Base input for anime titles
+        title = anime['title']
+        title_english = anime.get('title_english') or ''
+        synonyms = anime.get('title_synonyms', []) or []  # Ensure it's always a list
+
+        fullnames = [title]
+        title_tokens = [t for t in re.split(r"[ /]+", title.strip()) if t]
+        keynames = [title] + title_tokens
+
+        if title_english:
+            fullnames.append(title_english)
+            keynames.append(title_english)
+            title_english_tokens = [t for t in re.split(r"[ /]+", title_english.strip()) if t]
+            keynames.extend(title_english_tokens)
+
+        if synonyms:
+            fullnames.extend(synonyms)
+            keynames.extend(synonyms)
+            for syn in synonyms:
+                if syn:
+                    title_syn_tokens = [t for t in re.split(r"[ /]+", syn.strip()) if t]
+                    keynames.extend(title_syn_tokens)
+
+        # Character inputs -> Find anime based on character names
+        char_inputs = set()  # Use set to avoid duplicates
+        raw_chars = anime.get('characters', [])[:5]
+        for char in raw_chars:
+            full_name = char.get('name', '')
+            if not full_name:
+                continue
+            full_name = full_name.strip()
+            # Always add the raw/official name
+            char_inputs.add(full_name)
+            # Reversal logic for "Last, First" formats (common on MAL)
+            if ', ' in full_name:
+                parts = full_name.split(', ', 1)
+                if len(parts) == 2:
+                    last = parts[0].strip()
+                    first = parts[1].strip()
+                    # Add "First Last" (Western order)
+                    char_inputs.add(f"{first} {last}")
+                    # Add first name only (most common user search!)
+                    char_inputs.add(first)
+                    # Add last name only
+                    char_inputs.add(last)
+
+        keynames = keynames + list(char_inputs)
+
+        action = {
+            "_index": self.indices['anime'],
+            "_id": anime['mal_id'],
+            "_source": {
+                "mal_id": anime['mal_id'],
+                "title": anime['title'],
+                "title_english": anime['title_english'],
+                "title_japanese": anime['title_japanese'],
+                "title_synonyms": anime.get('title_synonyms', []),
+                "search_full_names": fullnames,
+                "search_key_names": keynames,
+                "synopsis": anime.get('synopsis', ''),
+                "type": anime.get('type'),
+                "source": anime.get('source'),
+                "status": anime.get('status'),
+                "score": anime.get('score'),
+                "popularity": anime.get('popularity'),
+                "episodes": anime.get('episodes', 0),
+                "duration": anime.get('duration'),
+                "duration_minutes": extract_minutes_from_duration(anime.get('duration')),
+                "rating": anime.get('rating'),
+                "season": anime['season'] if anime.get('season', None) else season,
+                "year": anime['year'] if anime.get('year', None) else year,
+                "aired_string": anime.get('aired_string'),
+                "image_url": anime.get('image_url'),
+                "trailer_url": anime.get('trailer_url'),
+
+                # Nested relationships
+                "studios": anime.get('studios', []),
+                "genres": anime.get('genres', []),
+                "themes": anime.get('themes', []),
+                "demographics": anime.get('demographics', []),
+                "characters": anime.get('characters', []),
+
+                # Flat arrays for filtering
+                "studio_names": [s['name'] for s in anime.get('studios', [])],
+                "genre_names": [g['name'] for g in anime.get('genres', [])],
+                "theme_names": [t['name'] for t in anime.get('themes', [])],
+                "demographic_names": [d['name'] for d in anime.get('demographics', [])],
+                # "character_names": [c['name'] for c in anime.get('characters', [])],
+                # "voice_actor_names": list(set(
+                #     va['name']
+                #     for c in anime.get('characters', [])
+                #     for va in c.get('voice_actors', [])
+                # )),
+
+                # Computed fields
+                "is_popular": is_popular,
+                "score_range": score_range,
+                "episode_range": episode_range
+            }
+        }
+        return action
+
+    def index_search_suggestions(self, db_service, mal_ids=None):
+        """Index all searchable entities for autocomplete (only `mal_ids` anime if given)"""
         logger.info("Indexing search suggestions...")
 
-        actions = []
+        # Pipelined bulk index, batch by batch as the actions are generated
+        batch_size = int(os.getenv("ES_BATCH_SIZE", 500))
+        batches = chunked(self.search_suggestion_actions(db_service, mal_ids), batch_size)
+        total_success, total_failed = self.bulk_pipeline(batches, desc="Index search_suggestions")
+
+        logger.info(
+            f"✅ Finished indexing search suggestions. "
+            f"Success={total_success}, Failed={total_failed}"
+        )
+
+        return total_success
+
+    def search_suggestion_actions(self, db_service, mal_ids=None):
+        """
+        Yield the bulk actions of every search suggestion (anime rows streamed from the database).
+        With `mal_ids`, only those anime and the studios / genres / themes / demographics linked to them.
+        """
+        filter_params = (list(mal_ids),) if mal_ids is not None else None
+
+        def linked_filter(alias, junction, column):
+            """Restrict a category query to the categories of `mal_ids`"""
+            if mal_ids is None:
+                return ""
+            return f"AND {alias}.mal_id IN (SELECT {column} FROM {junction} WHERE anime_id = ANY(%s))"
 
         # 1. Anime
         anime_query = """
@@ -651,11 +1052,12 @@ class ElasticsearchService:
         LEFT JOIN anime_characters ac ON a.mal_id = ac.anime_id
         LEFT JOIN characters c ON ac.character_id = c.mal_id
         WHERE a.title IS NOT NULL
+        {anime_filter}
         GROUP BY a.mal_id
         ORDER BY a.popularity ASC
-        """
+        """.format(anime_filter="AND a.mal_id = ANY(%s)" if mal_ids is not None else "")
 
-        anime_results = db_service.execute_query(anime_query)
+        anime_results = db_service.stream_query(anime_query, filter_params)
         for anime in anime_results:
             # Base input for anime titles
             title = anime['title']
@@ -705,7 +1107,7 @@ class ElasticsearchService:
 
             keynames = keynames + list(char_inputs)
 
-            actions.append({
+            yield {
                 "_index": self.indices['search_suggestions'],
                 "_id": f"anime_{anime['mal_id']}",
                 "_source": {
@@ -726,7 +1128,7 @@ class ElasticsearchService:
                         }
                     }
                 }
-            })
+            }
 
         # 3. Studios
         studios_query = """
@@ -735,11 +1137,12 @@ class ElasticsearchService:
             s.name
         FROM studios s
         WHERE s.name IS NOT NULL
-        """
+        {category_filter}
+        """.format(category_filter=linked_filter("s", "anime_studios", "studio_id"))
 
-        studio_results = db_service.execute_query(studios_query)
+        studio_results = db_service.execute_query(studios_query, filter_params)
         for studio in studio_results:
-            actions.append({
+            yield {
                 "_index": self.indices['search_suggestions'],
                 "_id": f"studio_{studio['mal_id']}",
                 "_source": {
@@ -754,7 +1157,7 @@ class ElasticsearchService:
                         "contexts": {"entity_type": ["studio", "global"]}
                     }
                 }
-            })
+            }
 
         # 4. Genres
         genres_query = """
@@ -763,11 +1166,12 @@ class ElasticsearchService:
             g.name
         FROM genres g
         WHERE g.name IS NOT NULL
-        """
+        {category_filter}
+        """.format(category_filter=linked_filter("g", "anime_genres", "genre_id"))
 
-        genre_results = db_service.execute_query(genres_query)
+        genre_results = db_service.execute_query(genres_query, filter_params)
         for genre in genre_results:
-            actions.append({
+            yield {
                 "_index": self.indices['search_suggestions'],
                 "_id": f"genre_{genre['mal_id']}",
                 "_source": {
@@ -782,7 +1186,7 @@ class ElasticsearchService:
                         "contexts": {"entity_type": ["genre", "global"]}
                     }
                 }
-            })
+            }
 
         # 5. Themes
         themes_query = """
@@ -791,11 +1195,12 @@ class ElasticsearchService:
             t.name
         FROM themes t
         WHERE t.name IS NOT NULL
-        """
+        {category_filter}
+        """.format(category_filter=linked_filter("t", "anime_themes", "theme_id"))
 
-        theme_results = db_service.execute_query(themes_query)
+        theme_results = db_service.execute_query(themes_query, filter_params)
         for theme in theme_results:
-            actions.append({
+            yield {
                 "_index": self.indices['search_suggestions'],
                 "_id": f"theme_{theme['mal_id']}",
                 "_source": {
@@ -810,7 +1215,7 @@ class ElasticsearchService:
                         "contexts": {"entity_type": ["theme", "global"]}
                     }
                 }
-            })
+            }
 
         # 6. Demographics
         demographics_query = """
@@ -819,11 +1224,12 @@ class ElasticsearchService:
             d.name
         FROM demographics d
         WHERE d.name IS NOT NULL
-        """
+        {category_filter}
+        """.format(category_filter=linked_filter("d", "anime_demographics", "demographic_id"))
 
-        demographic_results = db_service.execute_query(demographics_query)
+        demographic_results = db_service.execute_query(demographics_query, filter_params)
         for demographic in demographic_results:
-            actions.append({
+            yield {
                 "_index": self.indices['search_suggestions'],
                 "_id": f"demographic_{demographic['mal_id']}",
                 "_source": {
@@ -839,58 +1245,32 @@ class ElasticsearchService:
                         "contexts": {"entity_type": ["demographic", "global"]}
                     }
                 }
-            })
-
-        # Bulk index
-        batch_size = int(os.getenv("ES_BATCH_SIZE", 500))
-        total_success = 0
-        total_failed = 0
-
-        if actions:
-            with tqdm(total=len(actions), desc="Index search_suggestions") as pbar:
-                for batch_num, batch in enumerate(chunked(actions, batch_size), start=1):
-                    try:
-                        success, failed = helpers.bulk(self.es, batch, stats_only=True, raise_on_error=False)
-
-                        total_success += success
-                        total_failed += failed
-
-                    except Exception as e:
-                        logger.error(f"❌ Bulk indexing failed on batch {batch_num}: {e}")
-
-                    pbar.update(success)
-
-            logger.info(
-                f"✅ Finished indexing search suggestions. "
-                f"Success={total_success}, Failed={total_failed}"
-            )
-
-            return total_success
-
-        return 0
+            }
 
-    def print_indexing_summary(self, results):
-        """Print indexing summary"""
+    def print_indexing_summary(self, results, seconds=None):
+        """Print indexing summary (and end-to-end throughput when the run time is given)"""
         print("\n" + "=" * 60)
         print("ELASTICSEARCH INDEXING SUMMARY")
         print("=" * 60)
 
         for index_name, count in results.items():
             print(f"{index_name:20} {count:,} documents")
+        if seconds:
+            total = sum(results.values())
+            print(f"{'total':20} {total:,} documents in {seconds:.1f}s ({total / seconds:,.0f} docs/s)")
 
         # Get index sizes
         try:
-            stats = self.es.indices.stats()
+            stats = self.es.indices.stats(index=list(self.indices.values()))
             print("\n" + "=" * 60)
             print("INDEX SIZES")
             print("=" * 60)
 
-            for index in self.indices.values():
-                if index in stats['indices']:
-                    docs = stats['indices'][index]['total']['docs']['count']
-                    size_bytes = stats['indices'][index]['total']['store']['size_in_bytes']
-                    size_mb = size_bytes / (1024 * 1024)
-                    print(f"{index:25} {docs:,} docs, {size_mb:.2f} MB")
+            for index, index_stats in sorted(stats['indices'].items()):
+                docs = index_stats['total']['docs']['count']
+                size_bytes = index_stats['total']['store']['size_in_bytes']
+                size_mb = size_bytes / (1024 * 1024)
+                print(f"{index:40} {docs:,} docs, {size_mb:.2f} MB")
         except Exception as e:
             logger.error(f"Error getting stats: {e}")
 
@@ -1451,10 +1831,13 @@ class ElasticsearchService:
         return result
 
     def delete_indices(self):
-        """Delete all indices (use with caution!)"""
+        """Delete all indices and every generation behind their aliases (use with caution!)"""
         try:
-            for index in self.indices.values():
-                if self.es.indices.exists(index=index):
+            for key, alias in self.indices.items():
+                indices = [f"{alias}-{stamp}" for stamp in self.generations(key)]
+                if self.es.indices.exists(index=alias) and not self.es.indices.exists_alias(name=alias):
+                    indices.append(alias)
+                for index in indices:
                     self.es.indices.delete(index=index)
                     logger.info(f"Deleted index: {index}")
             print("✅ All indices deleted\n")
@@ -1464,9 +1847,13 @@ class ElasticsearchService:
 
 
 def chunked(iterable, size):
-    """Yield successive chunks from iterable."""
-    for i in range(0, len(iterable), size):
-        yield iterable[i:i + size]
+    """Yield successive chunks (lists) from an iterable, consuming it lazily."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
 
 def extract_minutes_from_duration(duration_str):
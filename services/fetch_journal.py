@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+PENDING = "pending"
+FETCHED = "fetched"
+FAILED = "failed"
+
+
+class FetchJournal:
+    """
+    Crash-safe, append-only journal of a fetch run.
+
+    Every event (run start, page cursor, per-mal_id status change) is one JSON
+    line written with fsync, so after a crash the replayed journal says exactly
+    which page to fetch next and which anime still need their characters.
+    """
+
+    def __init__(self, path, compact_ratio=4):
+        self.path = Path(path)
+        self.compact_ratio = compact_ratio
+        self.run = None            # parameters of the current run
+        self.next_page = None      # next top-anime page to fetch
+        self.run_listed = 0        # anime listed since the run started
+        self.entries = {}          # mal_id -> {status, attempts, reason, updated_at}
+        self._lines = 0
+        self._lock = threading.Lock()
+        self._replay()
+
+    # ========== REPLAY ==========
+
+    def _replay(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+
+        valid = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn final write
+                self._apply(json.loads(line))
+                valid += len(line)
+                self._lines += 1
+
+        if valid != self.path.stat().st_size:
+            with open(self.path, "r+b") as f:
+                f.truncate(valid)
+
+    def _apply(self, event):
+        kind = event["event"]
+        if kind == "run":
+            self.run = event["params"]
+            self.next_page = event["params"].get("start_page")
+            self.run_listed = 0
+        elif kind == "page":
+            self.next_page = event["next_page"]
+            self.run_listed += event.get("listed", 0)
+        elif kind == "status":
+            entry = self.entries.setdefault(event["mal_id"], {"attempts": 0})
+            entry["status"] = event["status"]
+            entry["attempts"] = event.get("attempts", entry["attempts"])
+            entry["reason"] = event.get("reason")
+            entry["updated_at"] = event["at"]
+        elif kind == "snapshot":
+            self.run = event["run"]
+            self.next_page = event["next_page"]
+            self.run_listed = event["run_listed"]
+            self.entries = {int(k): v for k, v in event["entries"].items()}
+
+    # ========== WRITE ==========
+
+    def _write(self, events):
+        lines = b"".join(
+            (json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+            for event in events
+        )
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            for event in events:
+                self._apply(event)
+            self._lines += len(events)
+
+    def start_run(self, params, fresh=False):
+        """Record the parameters of a new run (start page, limit, ...); `fresh` forgets every id"""
+        if fresh:
+            with self._lock:
+                with open(self.path, "wb"):
+                    pass
+                self.entries = {}
+                self._lines = 0
+        self._write([{"event": "run", "params": params}])
+
+    def record_page(self, next_page, new_ids=()):
+        """Mark the anime listed on a page as pending and advance the page cursor"""
+        now = time.time()
+        events = [{"event": "status", "mal_id": mal_id, "status": PENDING, "at": now} for mal_id in new_ids]
+        events.append({"event": "page", "next_page": next_page, "listed": len(events)})
+        self._write(events)
+
+    def mark_pending(self, mal_ids):
+        now = time.time()
+        self._write([{"event": "status", "mal_id": mal_id, "status": PENDING, "at": now} for mal_id in mal_ids])
+
+    def mark_fetched(self, mal_id):
+        attempts = self.entries.get(mal_id, {}).get("attempts", 0) + 1
+        self._write([{"event": "status", "mal_id": mal_id, "status": FETCHED, "attempts": attempts, "at": time.time()}])
+
+    def mark_failed(self, mal_id, reason):
+        attempts = self.entries.get(mal_id, {}).get("attempts", 0) + 1
+        self._write([{
+            "event": "status", "mal_id": mal_id, "status": FAILED,
+            "attempts": attempts, "reason": str(reason), "at": time.time()
+        }])
+
+    def compact(self):
+        """Rewrite the journal as a single snapshot once replaying it gets expensive"""
+        with self._lock:
+            if self._lines <= self.compact_ratio * max(len(self.entries), 1):
+                return False
+            snapshot = {
+                "event": "snapshot",
+                "run": self.run,
+                "next_page": self.next_page,
+                "run_listed": self.run_listed,
+                "entries": self.entries,
+            }
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps(snapshot, ensure_ascii=False, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._lines = 1
+            return True
+
+    # ========== READ ==========
+
+    def ids_with_status(self, *statuses):
+        return sorted(mal_id for mal_id, entry in self.entries.items() if entry["status"] in statuses)
+
+    def to_retry(self, max_attempts=5):
+        """Anime whose characters are still pending or failed fewer than `max_attempts` times"""
+        return [
+            mal_id for mal_id in self.ids_with_status(PENDING, FAILED)
+            if self.entries[mal_id]["attempts"] < max_attempts
+        ]
+
+    def summary(self):
+        counts = {PENDING: 0, FETCHED: 0, FAILED: 0}
+        for entry in self.entries.values():
+            counts[entry["status"]] += 1
+        return {"next_page": self.next_page, **counts}
@@ -0,0 +1,155 @@
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from tqdm import tqdm
+
+# Upper bounds (seconds) of the request latency histogram buckets; the last one is open-ended
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def endpoint_name(path):
+    """Collapse ids so /anime/20/characters and /anime/21/characters share one endpoint"""
+    return re.sub(r"/\d+", "/{id}", path)
+
+
+def _empty_endpoint():
+    return {
+        "requests": 0,
+        "bytes": 0,
+        "status": {},
+        "rate_limited": 0,
+        "retries": 0,
+        "latency_sum": 0.0,
+        "latency_max": 0.0,
+        "latency_histogram": [0] * (len(LATENCY_BUCKETS) + 1),
+    }
+
+
+class FetchMetrics:
+    """
+    Thread-safe per-endpoint request metrics for a fetch run: latency histogram,
+    bytes received, 429s, retries, time slept on rate limits and parse/write time.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.endpoints = {}
+        self.rate_limit_sleep = 0.0
+        self.timers = {}
+        self._lock = threading.Lock()
+
+    # ========== RECORDING ==========
+
+    def record_request(self, path, latency, status, nbytes):
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint_name(path), _empty_endpoint())
+            stats["requests"] += 1
+            stats["bytes"] += nbytes
+            stats["status"][str(status)] = stats["status"].get(str(status), 0) + 1
+            stats["rate_limited"] += status == 429
+            stats["latency_sum"] += latency
+            stats["latency_max"] = max(stats["latency_max"], latency)
+            stats["latency_histogram"][bucket] += 1
+
+    def record_retry(self, path):
+        with self._lock:
+            self.endpoints.setdefault(endpoint_name(path), _empty_endpoint())["retries"] += 1
+
+    def record_sleep(self, seconds):
+        with self._lock:
+            self.rate_limit_sleep += seconds
+
+    @contextmanager
+    def timer(self, name):
+        """Accumulate the time spent in a block (e.g. 'parse', 'write')"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.timers[name] = self.timers.get(name, 0.0) + elapsed
+
+    # ========== AGGREGATION ==========
+
+    def snapshot(self, reset=False):
+        """Plain-dict copy of the counters (optionally zeroing them, for per-task deltas)"""
+        with self._lock:
+            data = json.loads(json.dumps({
+                "endpoints": self.endpoints,
+                "rate_limit_sleep": self.rate_limit_sleep,
+                "timers": self.timers,
+            }))
+            if reset:
+                self.endpoints = {}
+                self.rate_limit_sleep = 0.0
+                self.timers = {}
+        return data
+
+    def merge(self, snapshot):
+        """Add the counters of another process' snapshot"""
+        with self._lock:
+            for name, other in snapshot["endpoints"].items():
+                stats = self.endpoints.setdefault(name, _empty_endpoint())
+                for key in ("requests", "bytes", "rate_limited", "retries", "latency_sum"):
+                    stats[key] += other[key]
+                stats["latency_max"] = max(stats["latency_max"], other["latency_max"])
+                for code, count in other["status"].items():
+                    stats["status"][code] = stats["status"].get(code, 0) + count
+                stats["latency_histogram"] = [a + b for a, b in zip(stats["latency_histogram"], other["latency_histogram"])]
+            self.rate_limit_sleep += snapshot["rate_limit_sleep"]
+            for name, seconds in snapshot["timers"].items():
+                self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def summary(self):
+        data = self.snapshot()
+        elapsed = time.time() - self.started_at
+        total_requests = sum(stats["requests"] for stats in data["endpoints"].values())
+
+        for stats in data["endpoints"].values():
+            stats["latency_avg"] = stats["latency_sum"] / stats["requests"] if stats["requests"] else 0.0
+            stats["latency_buckets"] = [*LATENCY_BUCKETS, None]
+
+        return {
+            "started_at": self.started_at,
+            "elapsed_s": elapsed,
+            "requests": total_requests,
+            "requests_per_s": total_requests / elapsed if elapsed else 0.0,
+            "bytes": sum(stats["bytes"] for stats in data["endpoints"].values()),
+            **data,
+        }
+
+    def status_line(self):
+        """One-line progress summary for the live reporter"""
+        s = self.summary()
+        rate_limited = sum(e["rate_limited"] for e in s["endpoints"].values())
+        retries = sum(e["retries"] for e in s["endpoints"].values())
+        timers = " ".join(f"{name}={seconds:.1f}s" for name, seconds in s["timers"].items())
+        return (f"[metrics] {s['requests']} req ({s['requests_per_s']:.2f}/s) "
+                f"{s['bytes'] / 1024 / 1024:.1f} MB | 429s={rate_limited} retries={retries} "
+                f"rate-limit sleep={s['rate_limit_sleep']:.1f}s {timers}")
+
+    def write_summary(self, directory):
+        """Write the run summary to <directory>/fetch_<timestamp>.json"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"fetch_{time.strftime('%Y%m%d_%H%M%S', time.localtime(self.started_at))}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        return path
+
+    def start_live_reporter(self, interval=10.0):
+        """Print a status line every `interval` seconds until the returned event is set"""
+        stop = threading.Event()
+
+        def report():
+            while not stop.wait(interval):
+                tqdm.write(self.status_line())
+
+        threading.Thread(target=report, daemon=True).start()
+        return stop
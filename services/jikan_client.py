@@ -0,0 +1,248 @@
+import fcntl
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Jikan v4 public limits: 3 requests per second and 60 requests per minute
+DEFAULT_RATE_LIMITS = (
+    (int(os.getenv("JIKAN_RATE_PER_SECOND", 3)), 1.0),
+    (int(os.getenv("JIKAN_RATE_PER_MINUTE", 60)), 60.0),
+)
+
+
+class TokenBucket:
+    """
+    Thread-safe limiter shared by every worker talking to Jikan.
+
+    Each (capacity, period) window holds `capacity` tokens and a spent token is
+    returned `period` (+ `margin` for network jitter) seconds after it was taken,
+    so no sliding window ever sees more than `capacity` requests while the
+    budget stays saturated.
+    """
+
+    def __init__(self, limits=DEFAULT_RATE_LIMITS, margin=None):
+        margin = float(os.getenv("JIKAN_RATE_MARGIN", 0.05)) if margin is None else margin
+        self.limits = [(capacity, period + margin) for capacity, period in limits if capacity > 0]
+        self._spent = [deque() for _ in self.limits]
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _take(self, spent_windows, blocked_until, now):
+        """Spend a token from every window if possible, else return the seconds to wait"""
+        wait = blocked_until - now
+        for (capacity, period), spent in zip(self.limits, spent_windows):
+            while spent and spent[0] + period <= now:
+                spent.popleft()
+            if len(spent) >= capacity:
+                wait = max(wait, spent[0] + period - now)
+        if wait <= 0:
+            for spent in spent_windows:
+                spent.append(now)
+        return wait
+
+    def acquire(self):
+        """Block until a request may be sent. Returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                wait = self._take(self._spent, self._blocked_until, time.monotonic())
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def penalize(self, seconds):
+        """Pause every caller for `seconds` (e.g. after a 429 with Retry-After)"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    TokenBucket whose state lives in a flock-protected file, so every process
+    (and thread) on the host draws from one shared Jikan budget.
+    """
+
+    def __init__(self, path, limits=DEFAULT_RATE_LIMITS, margin=None):
+        super().__init__(limits, margin)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+
+    def _update(self, func):
+        """Run func(spent_windows, state) under an exclusive lock and persist the state"""
+        with open(self.path, "r+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                raw = f.read()
+                state = json.loads(raw) if raw else {}
+                spent = [deque(w) for w in state.get("spent", [])]
+                spent += [deque() for _ in range(len(self.limits) - len(spent))]
+                result = func(spent, state)
+                state["spent"] = [list(w) for w in spent]
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return result
+
+    def acquire(self):
+        waited = 0.0
+        while True:
+            # Wall-clock time: monotonic clocks are not comparable across processes
+            wait = self._update(
+                lambda spent, state: self._take(spent, state.get("blocked_until", 0.0), time.time())
+            )
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def penalize(self, seconds):
+        def block(spent, state):
+            state["blocked_until"] = max(state.get("blocked_until", 0.0), time.time() + seconds)
+        self._update(block)
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class JikanClient:
+    """
+    Rate-limit-aware HTTP client for the Jikan API with a bounded worker pool
+    """
+
+    def __init__(self, base_url=None, limiter=None, concurrency=None,
+                 max_retries=5, timeout=10, backoff_base=1.0, backoff_cap=60.0,
+                 cache=None, offline=False, metrics=None):
+        self.base_url = base_url or os.getenv("JIKAN_BASE_URL", "https://api.jikan.moe/v4")
+        self.limiter = limiter or TokenBucket()
+        self.cache = cache  # optional ResponseCache of raw payloads
+        self.offline = offline  # serve from the cache only, never touch the network
+        self.metrics = metrics  # optional FetchMetrics
+        self.concurrency = concurrency or int(os.getenv("JIKAN_CONCURRENCY", 4))
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        # requests.Session is not safe to share between threads
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def backoff(self, attempt):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def get(self, path, params=None):
+        """
+        GET `path` relative to the base url, retrying 429s, 5xx and network errors.
+        With a cache, cached entries are revalidated with ETag / Last-Modified and
+        fresh 200s are stored; offline, the cache is the only source.
+
+        :return: the final response, or None if every attempt failed on the network
+                 (or, offline, if the request is not cached)
+        """
+        url = f"{self.base_url}{path}"
+        response = None
+        cached = self.cache.get(url, params) if self.cache else None
+
+        if self.offline:
+            return self.cache.to_response(cached) if cached else None
+
+        headers = self.cache.validators(cached) if cached else {}
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._record_retry(path)
+            waited = self.limiter.acquire()
+            if self.metrics:
+                self.metrics.record_sleep(waited)
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                self._record_request(path, start, "error", None)
+                if attempt == self.max_retries:
+                    print(f"Error requesting {url}: {e}")
+                    return None
+                self._sleep_backoff(attempt)
+                continue
+
+            self._record_request(path, start, response.status_code, response)
+
+            if response.status_code == 429:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                self.limiter.penalize(retry_after if retry_after is not None else self.backoff(attempt))
+                continue
+
+            if response.status_code >= 500 and attempt < self.max_retries:
+                self._sleep_backoff(attempt)
+                continue
+
+            if response.status_code == 304 and cached:
+                return self.cache.to_response(cached)
+            if response.status_code == 200 and self.cache:
+                self.cache.put(url, params, response)
+            return response
+
+        return response
+
+    def _sleep_backoff(self, attempt):
+        if self.metrics:
+            with self.metrics.timer("backoff"):
+                time.sleep(self.backoff(attempt))
+        else:
+            time.sleep(self.backoff(attempt))
+
+    def _record_request(self, path, start, status, response):
+        if self.metrics:
+            nbytes = len(response.content) if response is not None else 0
+            self.metrics.record_request(path, time.perf_counter() - start, status, nbytes)
+
+    def _record_retry(self, path):
+        if self.metrics:
+            self.metrics.record_retry(path)
+
+    def map(self, func, items):
+        """
+        Run `func(item)` for every item on the worker pool.
+
+        Yields (item, result) pairs in completion order; an exception raised by
+        `func` is yielded as the result.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(func, item): item for item in items}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                yield futures[future], result
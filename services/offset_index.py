@@ -0,0 +1,60 @@
+import os
+import struct
+
+# Sidecar index entry: mal_id, byte offset, byte length (16 bytes, little endian)
+INDEX_ENTRY = struct.Struct("<iQI")
+
+
+class OffsetIndex:
+    """
+    Append-only binary index of mal_id -> (offset, length) for a data file.
+
+    Entries are fixed-size and the latest entry for a mal_id wins. The data file
+    is always written before the index, so on load any entry pointing past the
+    end of the data file is a torn write and gets truncated away.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = {}
+
+    def load(self, data_size, read_only=False):
+        """Read every entry; returns the end of the last indexed record"""
+        if read_only and not self.path.exists():
+            return 0
+        if not read_only:
+            self.path.touch(exist_ok=True)
+        raw = self.path.read_bytes()
+        valid = len(raw) - len(raw) % INDEX_ENTRY.size
+        indexed_end = 0
+        self.offsets.clear()
+
+        for pos in range(0, valid, INDEX_ENTRY.size):
+            mal_id, offset, length = INDEX_ENTRY.unpack_from(raw, pos)
+            if offset + length > data_size:
+                valid = pos
+                break
+            self.offsets[mal_id] = (offset, length)
+            indexed_end = max(indexed_end, offset + length)
+
+        if valid != len(raw) and not read_only:
+            with open(self.path, "r+b") as f:
+                f.truncate(valid)
+
+        return indexed_end
+
+    def append(self, entries):
+        """Durably append (mal_id, offset, length) entries"""
+        if not entries:
+            return
+        with open(self.path, "ab") as f:
+            f.write(b"".join(INDEX_ENTRY.pack(*entry) for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+        for mal_id, offset, length in entries:
+            self.offsets[mal_id] = (offset, length)
+
+    def reset(self):
+        with open(self.path, "wb"):
+            pass
+        self.offsets.clear()
@@ -0,0 +1,105 @@
+import heapq
+import itertools
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+DAY = 24 * 60 * 60
+
+
+class RefreshScheduler:
+    """
+    Last-fetched timestamp and popularity per mal_id, plus the refresh priority queue.
+
+    State is an append-only JSONL file (latest line per mal_id wins). Priority is
+    staleness weighted by popularity, so popular titles are refreshed more often
+    and nothing goes longer than `max_age_days` without a refresh.
+    """
+
+    def __init__(self, path, max_age_days=None):
+        self.path = Path(path)
+        self.max_age = float(max_age_days or os.getenv("REFRESH_MAX_AGE_DAYS", 30)) * DAY
+        self.state = {}  # mal_id -> (fetched_at, popularity)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+        with open(self.path, "rb") as f:
+            for line in f:
+                if line.endswith(b"\n"):
+                    record = json.loads(line)
+                    self.state[record["mal_id"]] = (record["fetched_at"], record.get("popularity"))
+
+    def record(self, anime_list, fetched_at=None):
+        """Remember when these anime (dicts with mal_id / popularity) were fetched"""
+        fetched_at = fetched_at or time.time()
+        lines = []
+        for anime in anime_list:
+            self.state[anime['mal_id']] = (fetched_at, anime.get('popularity'))
+            lines.append(json.dumps({
+                "mal_id": anime['mal_id'],
+                "fetched_at": fetched_at,
+                "popularity": anime.get('popularity')
+            }) + "\n")
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def priority(self, mal_id, now):
+        """Seconds since last fetch, weighted up for popular (low popularity rank) titles"""
+        fetched_at, popularity = self.state.get(mal_id, (0, None))
+        age = now - fetched_at
+        weight = 1.0 / math.log2(2 + popularity) if popularity else 0.05
+        return age * weight
+
+    def schedule(self, mal_ids, hot=100, budget=None, now=None):
+        """
+        Anime to refresh: the `hot` highest-priority ids plus every id older than
+        the max age, highest priority first, capped at `budget` ids.
+        """
+        now = now or time.time()
+        queue = [(-self.priority(mal_id, now), mal_id) for mal_id in mal_ids]
+        heapq.heapify(queue)
+
+        selected = []
+        while queue and (budget is None or len(selected) < budget):
+            _, mal_id = heapq.heappop(queue)
+            fetched_at, _ = self.state.get(mal_id, (0, None))
+            if len(selected) < hot or now - fetched_at > self.max_age:
+                selected.append(mal_id)
+        return selected
+
+
+def write_delta_file(directory, changed_ids, source):
+    """Write a changed-ids delta file for the loader and indexer; returns its path"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    generated_at = time.time()
+    stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(generated_at))
+    # Exclusive create: a second run in the same second gets a numbered name instead of overwriting
+    for attempt in itertools.count():
+        path = directory / (f"changed_{stamp}.json" if attempt == 0 else f"changed_{stamp}_{attempt}.json")
+        try:
+            f = open(path, "x", encoding="utf-8")
+        except FileExistsError:
+            continue
+        with f:
+            json.dump({
+                "generated_at": generated_at,
+                "source": source,
+                "changed_ids": sorted(changed_ids)
+            }, f)
+        return path
+
+
+def load_delta_file(path):
+    """Read the changed mal_ids from a delta file"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["changed_ids"]
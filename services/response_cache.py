@@ -0,0 +1,91 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+
+class ResponseCache:
+    """
+    On-disk cache of raw Jikan responses, keyed by URL and query parameters.
+
+    Each entry is a gzip'd JSON file named after the SHA-256 of the request
+    (`<root>/ab/abcdef....json.gz`) holding the status, validators (ETag,
+    Last-Modified) and the untouched response body, so data can be re-derived
+    or replayed later without hitting the network.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(url, params=None):
+        query = urlencode(sorted((params or {}).items()))
+        return hashlib.sha256(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.root / key[:2] / f"{key}.json.gz"
+
+    def get(self, url, params=None):
+        """Return the cached entry for a request, or None"""
+        path = self._path(self.key(url, params))
+        if not path.exists():
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, url, params, response):
+        """Store a 200 response with its validators"""
+        entry = {
+            "url": url,
+            "params": params or {},
+            "status": response.status_code,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "body": response.text,
+        }
+        path = self._path(self.key(url, params))
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temp file and rename so a crash never leaves a half-written entry.
+        # The temp name is unique, so concurrent writers of one key never share it.
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.name, suffix=".tmp", delete=False) as raw:
+            try:
+                with gzip.open(raw, "wt", encoding="utf-8") as f:
+                    json.dump(entry, f, ensure_ascii=False)
+            except BaseException:
+                os.unlink(raw.name)
+                raise
+        os.replace(raw.name, path)
+        return entry
+
+    @staticmethod
+    def validators(entry):
+        """Conditional request headers for revalidating a cached entry"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def to_response(entry):
+        """Rebuild a requests.Response from a cached entry"""
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response._content = entry["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = entry["url"]
+        response.headers = CaseInsensitiveDict({
+            k: v for k, v in (("ETag", entry.get("etag")), ("Last-Modified", entry.get("last_modified"))) if v
+        })
+        return response
@@ -0,0 +1,80 @@
+from array import array
+
+import numpy as np
+
+
+class IntColumns:
+    """
+    Columnar buffer for rows made only of int32 values (junction table keys).
+
+    Each column is an `array('i')`, so a row costs 4 bytes per value instead of
+    a tuple plus one int object per value. Rows can still be appended one by
+    one, iterated as tuples (execute_values) or written straight to COPY.
+    """
+
+    def __init__(self, width, rows=()):
+        self.columns = [array('i') for _ in range(width)]
+        self.extend(rows)
+
+    @classmethod
+    def from_numpy(cls, matrix):
+        buffer = cls(matrix.shape[1])
+        for column, values in zip(buffer.columns, matrix.T):
+            column.frombytes(np.ascontiguousarray(values, dtype=np.int32).tobytes())
+        return buffer
+
+    def append(self, row):
+        for column, value in zip(self.columns, row):
+            column.append(value)
+
+    def extend(self, rows):
+        if isinstance(rows, IntColumns):
+            for column, other in zip(self.columns, rows.columns):
+                column.extend(other)
+        else:
+            for row in rows:
+                self.append(row)
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def __iter__(self):
+        """Rows as tuples of ints (what execute_values expects)"""
+        return zip(*self.columns)
+
+    @property
+    def nbytes(self):
+        return sum(column.itemsize * len(column) for column in self.columns)
+
+    def to_numpy(self):
+        """(rows, width) int32 matrix backed by copies of the columns"""
+        if not len(self):
+            return np.empty((0, len(self.columns)), dtype=np.int32)
+        return np.column_stack([np.frombuffer(column, dtype=np.int32) for column in self.columns])
+
+    def unique(self):
+        """Distinct rows in first-seen order (np.unique over each row packed into one key)"""
+        matrix = self.to_numpy()
+        if not len(matrix):
+            return IntColumns(len(self.columns))
+        _, first = np.unique(self._packed_keys(matrix), return_index=True)
+        return IntColumns.from_numpy(matrix[np.sort(first)])
+
+    @staticmethod
+    def _packed_keys(matrix):
+        """One sortable key per row: an int64 when the values fit, raw row bytes otherwise"""
+        bits = [int(column.max()).bit_length() for column in matrix.T]
+        if matrix.min() >= 0 and sum(bits) <= 63:
+            keys = np.zeros(len(matrix), dtype=np.int64)
+            for column, width in zip(matrix.T, bits):
+                keys = (keys << width) | column
+            return keys
+        matrix = np.ascontiguousarray(matrix)
+        return matrix.view(np.dtype((np.void, matrix.dtype.itemsize * matrix.shape[1]))).ravel()
+
+    def copy_text(self):
+        """Rows in COPY text format"""
+        if not len(self):
+            return ""
+        lines = ["\t".join(map(str, row)) for row in self.to_numpy().tolist()]
+        return "\n".join(lines) + "\n"